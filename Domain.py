@@ -1,4 +1,5 @@
 import os
+import sys
 import pygame
 from pygame import FULLSCREEN, SCALED
 # the first time utility is imported its namespace is initialized, every subsequent import
@@ -7,6 +8,7 @@ from components import utility
 from components.utility import file_resource
 from components.scenes.mainmenu import MainMenu
 from components.scenes.game import Game
+from components.domain.domainmanager import DomainManager
 
 if os.name == 'nt':
     # fixes graphical scaling issues with Windows
@@ -45,4 +47,7 @@ class Main:
         pygame.quit()
 
 if __name__ == '__main__':
+    # --workers thread or --workers process solves path requests off the main loop on a worker pool
+    if '--workers' in sys.argv:
+        DomainManager.worker_kind = sys.argv[sys.argv.index('--workers') + 1]
     Main().run()
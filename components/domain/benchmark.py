@@ -0,0 +1,190 @@
+import os
+import random
+import tempfile
+import tracemalloc
+from time import perf_counter
+from pygame.sprite import Sprite
+from components.bundled.pytmx import TiledMap
+from components.object.objectmanager import ObjectManager
+from .solver import Solver, Coordinate
+
+# headless solver benchmark on generated maps, run from the repository directory with
+#   python -m components.domain.benchmark [floors ...]
+# it needs no display, and the numbers are meant to be compared before and after a solver change
+
+# tile ids of the floor and wall tiles in data/domains/domain.tmx
+floor_tile, wall_tile = 615, 897
+
+class Marker(Sprite):
+    # stands in for a Teleporter, the solver only reads its cell and destination
+    def __init__(self, position, destination):
+        super().__init__()
+        self.coord = position
+        self.destination = destination
+
+class BenchmarkDomain:
+    # the parts of DomainManager the solver uses, over a map loaded without any images
+    def __init__(self, filename, floor_tiles):
+        self.map_object = TiledMap(filename)
+        self.floor_tiles = floor_tiles
+        # gid the tmx loader gave the floor tile, read from a cell that is always floor
+        self.floor_gid = self.map_object.get_tile_gid(0, 0, 0)
+        # nothing is drawn so there is no renderer or drawing area
+        self.renderer = None
+        self.surface_rect = None
+        self.object_manager = ObjectManager(None)
+        for item in self.map_object.objects:
+            position = (int(item.x / self.map_object.tilewidth), int(item.y / self.map_object.tileheight))
+            destination = (int(item.properties['dest_x']), int(item.properties['dest_y']))
+            self.object_manager.object_add('teleporters', Marker(position, destination))
+
+def write_map(filename, floors, floor_tiles=30, walls=0.2, pairs=3, seed=1):
+    # write a domain.tmx style map of floors side by side, with random walls and teleporter pairs
+    # each teleporter lands next to its partner on the other floor, the same as in domain.tmx
+    generator = random.Random(seed)
+    width, height = floors * floor_tiles, floor_tiles
+    cells = [[floor_tile] * width for _ in range(height)]
+    for y in range(height):
+        for x in range(width):
+            if generator.random() < walls:
+                cells[y][x] = wall_tile
+    # the floor gid is read from the top left cell
+    cells[0][0] = floor_tile
+    def free_cell(floor, taken):
+        # a random floor cell on a floor, with a floor cell to its right to land on
+        while True:
+            x = generator.randrange(floor * floor_tiles, ((floor + 1) * floor_tiles) - 1)
+            y = generator.randrange(height)
+            if (x, y) not in taken and (x + 1, y) not in taken:
+                cells[y][x] = cells[y][x + 1] = floor_tile
+                taken.update(((x, y), (x + 1, y)))
+                return x, y
+    taken = {(0, 0)}
+    teleporters = []
+    if floors > 1:
+        for floor in range(floors):
+            for _ in range(pairs):
+                # a pair between this floor and a random other floor
+                other = generator.choice([number for number in range(floors) if number != floor])
+                first, second = free_cell(floor, taken), free_cell(other, taken)
+                teleporters.append((first, (second[0] + 1, second[1])))
+                teleporters.append((second, (first[0] + 1, first[1])))
+    tileset = os.path.abspath(os.path.join('data', 'domains', 'ProjectUtumno_full.tsx'))
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             f'<map version="1.10" orientation="orthogonal" renderorder="right-down" width="{width}" '
+             f'height="{height}" tilewidth="32" tileheight="32" infinite="0" nextlayerid="3" '
+             f'nextobjectid="{len(teleporters) + 1}">',
+             f' <tileset firstgid="1" source="{tileset}"/>',
+             f' <layer id="1" name="Ground" width="{width}" height="{height}">',
+             '  <data encoding="csv">',
+             ',\n'.join(','.join(str(tile) for tile in row) for row in cells),
+             '</data>',
+             ' </layer>',
+             ' <objectgroup id="2" name="Objects">']
+    for number, (position, destination) in enumerate(teleporters):
+        # tile objects are anchored at their bottom left corner, so y is the bottom of the cell
+        lines += [f'  <object id="{number + 1}" name="Teleporter{number + 1}" type="Teleporter" gid="740" '
+                  f'x="{position[0] * 32}" y="{(position[1] + 1) * 32}" width="32" height="32">',
+                  '   <properties>',
+                  f'    <property name="dest_x" type="int" value="{destination[0]}"/>',
+                  f'    <property name="dest_y" type="int" value="{destination[1]}"/>',
+                  '   </properties>',
+                  '  </object>']
+    lines += [' </objectgroup>', '</map>', '']
+    with open(filename, 'w') as file:
+        file.write('\n'.join(lines))
+
+def percentile(values, fraction):
+    # nearest rank percentile of a sorted list
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+class Benchmark:
+    # runs find_path workloads on one generated map and reports on each of them
+    def __init__(self, floors, floor_tiles=30, queries=200, seed=1, strategy='astar'):
+        self.floors = floors
+        self.strategy = strategy
+        self.floor_tiles = floor_tiles
+        self.queries = queries
+        self.generator = random.Random(seed)
+        self.directory = tempfile.TemporaryDirectory()
+        filename = os.path.join(self.directory.name, f'bench_{floors}.tmx')
+        write_map(filename, floors, floor_tiles, seed=seed)
+        self.domain = BenchmarkDomain(filename, floor_tiles)
+        self.solver = Solver(self.domain)
+        self.solver.set_strategy(strategy)
+        # every query is a search, cached answers would only measure the cache
+        self.solver.cache.capacity = 0
+        self.grid = self.solver.grid
+        # the region every floor cell is in, to pick reachable and unreachable targets
+        self.cells = {}
+        for index in range(self.grid.width * self.grid.height):
+            if self.grid.walkable[index]:
+                self.cells.setdefault(self.grid.regions[index], []).append(self.grid.position(index))
+        # the largest region is where the queries start
+        self.main = max(self.cells.values(), key=len)
+
+    def workloads(self):
+        # (name, list of (start, destinations)) for each workload
+        main, others = self.main, [cells for cells in self.cells.values() if cells is not self.main]
+        choice = self.generator.choice
+        # the avatar moving to a clicked cell it can reach
+        avatar = [(choice(main), [Coordinate(choice(main))]) for _ in range(self.queries)]
+        # an agent looking for the nearest of fifteen generic items per floor
+        items = [Coordinate(choice(main)) for _ in range(15 * self.floors)]
+        agents = [(choice(main), items) for _ in range(self.queries)]
+        results = [('avatar', avatar), ('agents', agents)]
+        # a cell walled off from the start
+        if len(others) > 0:
+            unreachable = [(choice(main), [Coordinate(choice(choice(others)))]) for _ in range(self.queries)]
+            results.append(('unreachable', unreachable))
+        return results
+
+    def run(self, name, queries):
+        # time each query and count the cells it expanded, the scheduler's slice yields give the count
+        # peak memory is measured in a pass of its own first, since tracing allocations slows every query
+        tracemalloc.start()
+        for start, destinations in queries:
+            self.solver.find_path(start, destinations)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        times, nodes = [], []
+        for start, destinations in queries:
+            expanded = 0
+            started = perf_counter()
+            job = self.solver.solve_path(start, destinations)
+            while True:
+                try:
+                    expanded += next(job)
+                except StopIteration:
+                    break
+            times.append(perf_counter() - started)
+            nodes.append(expanded)
+        times.sort()
+        return {'workload': name, 'strategy': self.strategy, 'floors': self.floors, 'queries': len(queries),
+                'nodes': sum(nodes) / len(nodes), 'p50': percentile(times, 0.5) * 1000,
+                'p90': percentile(times, 0.9) * 1000, 'p99': percentile(times, 0.99) * 1000,
+                'max': times[-1] * 1000, 'peak': peak / 1024}
+
+    def report(self):
+        # run every workload, returns a list of result dicts
+        results = [self.run(name, queries) for name, queries in self.workloads()]
+        self.directory.cleanup()
+        return results
+
+def main(floors=(2, 4, 8, 16), floor_tiles=30, queries=200, seed=1, strategies=('astar', 'jps')):
+    # print a table of results for maps of growing size, times in milliseconds and memory in KiB
+    print(f'{"workload":<12}{"strategy":<9}{"floors":>7}{"queries":>8}{"nodes":>10}{"p50 ms":>9}{"p90 ms":>9}'
+          f'{"p99 ms":>9}{"max ms":>9}{"peak KiB":>10}')
+    for count in floors:
+        for strategy in strategies:
+            for result in Benchmark(count, floor_tiles, queries, seed, strategy).report():
+                print(f'{result["workload"]:<12}{result["strategy"]:<9}{result["floors"]:>7}{result["queries"]:>8}{result["nodes"]:>10.1f}'
+                      f'{result["p50"]:>9.3f}{result["p90"]:>9.3f}{result["p99"]:>9.3f}{result["max"]:>9.3f}'
+                      f'{result["peak"]:>10.1f}')
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) > 1:
+        main(tuple(int(argument) for argument in sys.argv[1:]))
+    else:
+        main()
@@ -0,0 +1,43 @@
+from pygame.sprite import collide_mask
+
+class Collisions:
+    # collision queries between domain objects, the broad phase reads the object manager's occupancy
+    # index for the cells around an object on its own floor, then rects are compared, and pixel masks
+    # only for the rects that overlap, so the cost doesn't grow with the number of objects on the map
+    # domain object images are at most a tile in size, so two that overlap have their centres in cells
+    # at most this far apart
+    reach = 1
+
+    def __init__(self, object_manager, floor_tiles):
+        self.object_manager = object_manager
+        self.floor_tiles = floor_tiles
+
+    def colliding(self, item, name):
+        # generator of the objects of a named list that collide with item, pixel accurate
+        cells = self.object_manager.occupancy.get(name)
+        if cells == None:
+            return
+        x, y = item.coord
+        floor = x // self.floor_tiles
+        for cell_x in range(x - self.reach, x + self.reach + 1):
+            # floors are side by side on the map, objects on different floors never collide
+            if cell_x // self.floor_tiles != floor:
+                continue
+            for cell_y in range(y - self.reach, y + self.reach + 1):
+                for other in cells.get((cell_x, cell_y), ()):
+                    if other is not item and item.rect.colliderect(other.rect) and collide_mask(item, other):
+                        yield other
+
+    def collides(self, item, name):
+        # whether any object of a named list collides with item
+        return next(self.colliding(item, name), None) != None
+
+    def pairs(self, name, other_name):
+        # list of (object, other object) colliding pairs between two named lists, each pair once when
+        # they are the same list, such as agents against agents or agents against items
+        results = []
+        for item in self.object_manager.objects(name):
+            for other in self.colliding(item, other_name):
+                if name != other_name or id(item) < id(other):
+                    results.append((item, other))
+        return results
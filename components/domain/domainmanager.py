@@ -1,12 +1,21 @@
 import pygame
-from random import randint
-from .solver import Solver
+from concurrent.futures import Future
+from components.gui.widget import colours
+from .solver import Solver, Coordinate
+from .freecells import FreeCells
+from .collisions import Collisions
+from .flowfield import FlowField
+from .scheduler import Scheduler
+from .workers import Workers
 
 class DomainManager:
     # reference to tile_gid tuple
     floor_gid = None
     # floor push button group
     floor_group = None
+    # 'thread' or 'process' to solve path requests on a pool of workers, None to solve them on the main
+    # loop with the scheduler, Domain.py sets it from its --workers option
+    worker_kind = None
 
     def __init__(self, surface):
         # needed functions for initialization
@@ -77,11 +86,20 @@ class DomainManager:
             # elif for more object types
             else:
                 raise Exception(f'Object: {item.type} not recognized')
+        # create a solver, once the teleporters are in
+        self.solver = Solver(self)
+        # pools of the cells nothing is on, for placing objects, by the solver's walkable areas
+        self.free_cells = FreeCells(self.map_object, self.floor_tiles, self.object_manager, self.solver)
+        # collision queries between objects
+        self.collisions = Collisions(self.object_manager, self.floor_tiles)
         # helper function to create objects
         def populate(number, cls, layer, group):
             for floor in range(self.floors):
                 for _ in range(number):
                     position = self.random_position_floor(self.floor_gid, floor)
+                    if position == None:
+                        # the floor is full
+                        break
                     # instantiate from the class
                     instance = cls(position)
                     # set the layer, higher takes priority
@@ -96,6 +114,8 @@ class DomainManager:
         populate(4, Agent, 4, 'agents')
         # create a player avatar and add it to the domain
         position = self.random_position_floor(self.floor_gid, 0)
+        if position == None:
+            raise Exception('Avatar: no free floor cell on the first floor')
         self.avatar = Avatar(position)
         self.avatar.layer = 5
         self.object_manager.object_add('avatar', self.avatar)
@@ -105,8 +125,17 @@ class DomainManager:
         self.switch_floor(self.get_floor(self.avatar.coord))
         # centre the main_viewport on the avatar
         self.main_viewport = list(self.avatar.rect.center)
-        # create a solver
-        self.solver = Solver(self)
+        # shared flow fields, key:value -> list_name:FlowField, created on first use by nearest
+        self.flow_fields = {}
+        # scheduler for path requests that are solved a slice at a time within a per-frame budget
+        self.scheduler = Scheduler()
+        # worker pool for path requests, None to solve them on the main loop with the scheduler
+        self.workers = None
+        if self.worker_kind != None:
+            self.use_workers(self.worker_kind)
+        # (avatar start, hovered cell) the path preview is for, and the request solving it
+        self.preview_key = None
+        self.preview_request = None
 
     # solver
     def pixel_to_cell(self, x, y):
@@ -116,23 +145,137 @@ class DomainManager:
     def find_path(self, start_position, destinations):
         return self.solver.find_path(start_position, destinations)
 
-    def random_position(self, gid, x_min, y_min, width, height):
-        # return a random empty cell position which is a specific tile gid
-        while True:
-            # random position
-            position = randint(x_min, x_min + width - 1), randint(y_min, y_min + height - 1)
-            # is it the correct gid
-            if self.cell_gid(position) == gid:
-                # is it already occupied by something
-                hit = False
-                for item in self.object_manager.domain():
-                    if item.coord == position:
-                        hit = True
-                        break
-                if hit:
-                    continue
-                # is correct gid and is empty
-                return position
+    # solver
+    def find_paths(self, requests):
+        # find_path for a list of (start, destinations) requests at once, results in request order
+        return self.solver.find_paths(requests)
+
+    # solver
+    def request_path(self, start_position, destinations):
+        # find_path spread over frames by the scheduler, or run on the worker pool if there is one
+        # returns a Future of the (path, goal object) result
+        if self.workers != None:
+            return self.submit_path(start_position, destinations)
+        return self.scheduler.submit(self.solver.solve_path(start_position, destinations))
+
+    # solver
+    def retarget_path(self, start_position, destinations):
+        # request_path for a requester whose destination keeps moving while it asks from the same start,
+        # like the avatar being clicked along, each request carries on from the last one's search tree
+        # the tree lives on the main loop, so with a worker pool this is the same as request_path
+        if self.preview_request != None and not self.preview_request.cancelled():
+            if self.preview_key == (start_position, tuple(item.coord for item in destinations)):
+                # the hovered path preview is this request, done or still being solved, it's the requester's
+                # from now on so moving the mouse away doesn't cancel it, the next preview is a new request
+                request = self.preview_request
+                self.preview_request = self.preview_key = None
+                return request
+        cached = self.solver.cached_path(start_position, destinations)
+        if cached != None:
+            # already solved, the future is done straight away
+            future = Future()
+            future.set_result(cached)
+            return future
+        # the cache was just missed, so the solver doesn't look it up again and count a second miss
+        if self.workers != None:
+            return self.submit_path(start_position, destinations, True)
+        return self.scheduler.submit(self.solver.retarget_path(start_position, destinations, True))
+
+    # solver
+    def submit_path(self, start_position, destinations, missed=False):
+        # find_path on the worker pool, returns a Future of the (path, goal object) result
+        return self.solver.submit_path(self.workers, start_position, destinations, missed)
+
+    # solver
+    def path_cache_stats(self):
+        # (hits, misses, entries) of the solver path cache
+        return self.solver.cache.stats()
+
+    # solver
+    def distances(self, name, towards=True, limit=None):
+        # numpy distance field to the nearest object of a named list, see Solver.distances
+        return self.solver.distances([item.coord for item in self.object_manager.objects(name)], towards, limit)
+
+    # solver
+    def within(self, position, limit):
+        return self.solver.within(position, limit)
+
+    def preview_path(self, position):
+        # speculatively solve the avatar's path to a hovered cell coordinate, or None when nothing is hovered
+        # it is solved within the scheduler budget and cached, so a click on that cell is answered at once
+        if position == None or not self.walkable(position):
+            key = None
+        else:
+            # (start, destination coordinates) the same as the request a click there would make
+            key = self.avatar.path_start(), (position,)
+        if key == self.preview_key and self.preview_request != None and not self.preview_request.cancelled():
+            # already previewing this path
+            return
+        if self.preview_request != None:
+            # the hovered cell or the avatar moved, the old preview isn't wanted
+            self.preview_request.cancel()
+            self.preview_request = None
+        self.preview_key = key
+        if key != None:
+            self.preview_request = self.retarget_path(key[0], [Coordinate(position)])
+
+    def draw_preview(self):
+        # draw the previewed path as lines between its waypoint cell centres, where it is on the shown floor
+        request = self.preview_request
+        if request == None or not request.done() or request.cancelled():
+            return
+        path = request.result()[0]
+        if path == None:
+            return
+        tile_width, tile_height = self.map_object.tilewidth, self.map_object.tileheight
+        # runs of moves, a teleport starts a new run, and moves never leave a floor so each run is on one
+        runs = [[self.preview_key[0]]]
+        for kind, cell in path:
+            if kind == 'teleport':
+                runs.append([cell])
+            else:
+                runs[-1].append(cell)
+        for run in runs:
+            if len(run) > 1 and self.get_floor(run[0]) == self.floor:
+                # cell centres in renderer map rect pixels, translated to view surface pixels
+                points = [self.renderer.translate_point(((x * tile_width) + (tile_width / 2), (y * tile_height) + (tile_height / 2)))
+                          for x, y in run]
+                pygame.draw.lines(self.surface, colours['highlight'], False, points, 2)
+
+    def use_workers(self, kind='process', count=None):
+        # move path requests off the main loop onto a pool of worker threads or processes
+        self.close()
+        self.workers = Workers(kind, count)
+
+    def close(self):
+        # release the worker pool if there is one
+        if self.workers != None:
+            self.workers.shutdown()
+
+    def nearest(self, position, name):
+        # path to the nearest object of a named list, in the same format as find_path
+        # every caller shares one flow field per list, which is repaired as objects are added and removed
+        grid = self.solver.get_grid()
+        if name not in self.flow_fields.keys() or self.flow_fields[name].grid is not grid:
+            # first use, or the map was reloaded so the field is rebuilt over the new grid
+            watched = name in self.flow_fields.keys()
+            self.flow_fields[name] = FlowField(grid, self.object_manager.objects(name))
+            if not watched:
+                self.object_manager.watch(name, lambda event, item: self.flow_fields[name].change(event, item))
+        return self.flow_fields[name].path(position)
+
+    # solver
+    def walkable(self, position):
+        return self.solver.walkable(position)
+
+    # solver
+    def region(self, position):
+        return self.solver.region(position)
+
+    def random_position(self, gid, x_min, y_min, width, height, region=None):
+        # return a random empty cell position which is a specific tile gid, or None when there isn't one
+        # and if region is given, inside that walkable region so it can be reached from it
+        return self.free_cells.sample(gid, x_min, y_min, width, height, region)
 
     def random_position_floor(self, gid, floor):
         return self.random_position(gid, floor * self.floor_tiles, 0, self.floor_tiles, self.floor_tiles)
@@ -166,17 +309,13 @@ class DomainManager:
             return None
         return self.map_object.get_tile_gid(x, y, 0)
 
-    def cell_objects(self, position, objects):
-        # return a list of objects which match the position coordinate
-        results = []
-        for item in objects:
-            if item.coord == position:
-                results.append(item)
-        return results
+    def cell_objects(self, position, name):
+        # return a list of the objects of a named list on the position coordinate, from the occupancy index
+        return self.object_manager.cell_objects(position, name)
 
     def teleporters(self, position):
         # if there is a teleporter at position then return its destination otherwise return None
-        teleporters = self.cell_objects(position, self.object_manager.objects('teleporters'))
+        teleporters = self.cell_objects(position, 'teleporters')
         if len(teleporters) > 0:
             # there is a teleporter here, return the first match
             return teleporters[0]
@@ -185,29 +324,20 @@ class DomainManager:
 
     def check_win(self):
         # if all the pickup items are in the same cell then the game is won
-        matched = True
-        last_item = None
-        objects = self.object_manager.objects('pickups')
+        # the occupancy index already counts the pickups per cell, so this is how many cells have any
+        cells = self.object_manager.cell_count('pickups')
         # if the avatar has an item in their inventory then include it
+        # the item in the avatar inventory still has the coordinates it was picked up from, because
+        # they aren't updated until it's placed on the map, so it counts as being there
         if self.avatar.inventory != None:
-            objects.append(self.avatar.inventory)
-        # compare cell coordinates for all items, if any don't match then the check fails
-        # the last item in the avatar inventory doesn't count until it's placed on the map
-        # because its coordinates aren't updated until then
-        for item in objects:
-            if last_item == None:
-                last_item = item
-                continue
-            if item.coord != last_item.coord:
-                matched = False
-                break
+            return cells == 0 or (cells == 1 and self.object_manager.occupied(self.avatar.inventory.coord, 'pickups'))
         # if true then won
-        return matched
+        return cells <= 1
 
     def check_loss(self):
         # if the avatar sprite collides with any member of the agents group that is a loss
-        if pygame.sprite.spritecollide(self.avatar, self.object_manager.objects('agents'),
-                                       False, pygame.sprite.collide_mask):
+        # only the agents in the cells around the avatar on its floor are tested
+        if self.collisions.collides(self.avatar, 'agents'):
             # collided
             return True
         # did not collide with any agents
@@ -230,7 +360,14 @@ class DomainManager:
         # update the domain
         self.object_manager.domain().update(elapsed_time)
 
-    def draw_domain(self):
+    def update_requests(self):
+        # work on pending path requests within the scheduler's budget, once per rendered frame however
+        # many simulation ticks the frame ran, so the budget is per frame and not per tick
+        self.scheduler.run()
+
+    def draw_domain(self, alpha=1.0):
+        # alpha is how far the simulation has come between its last tick and the next one, the objects
+        # are drawn that far between where they were at the start of the last tick and where they are
         # centre on desired viewport
         self.renderer.center(self.main_viewport)
         # if horizontal out-of-bounds limit them
@@ -247,5 +384,11 @@ class DomainManager:
         self.main_viewport = list(self.renderer.view_rect.center)
         # reupdate the viewport, viewport is updated here in case the bounds were modified
         self.renderer.center(self.main_viewport)
-        # draw map and group objects to surface
+        # move each object to where it's drawn, draw map and group objects to surface, and put them back
+        for item in self.object_manager.domain():
+            item.rect.center = item.interpolated(alpha)
         self.object_manager.domain().draw(self.surface)
+        for item in self.object_manager.domain():
+            item.rect.center = int(item.centre_xpos), int(item.centre_ypos)
+        # draw the hovered path preview over them
+        self.draw_preview()
@@ -0,0 +1,156 @@
+from array import array
+from heapq import heappush, heappop
+from .waypoints import Waypoints
+
+class FlowField:
+    # a reverse multi-source distance field rooted at every cell of a group of target objects
+    # each cell knows its cost to the nearest target, the next cell to step to, and which target that is,
+    # so any number of objects can read their way to the nearest target without a search of their own
+    # distance of a cell that can't reach any target
+    unreached = 0x7fffffff
+
+    def __init__(self, grid, targets):
+        # the grid the field is computed over
+        self.grid = grid
+        size = grid.width * grid.height
+        # cost to the nearest target for each cell
+        self.distance = array('i', [self.unreached]) * size
+        # next cell towards the nearest target, -1 at a target cell or where no target can be reached
+        self.next = array('i', [-1]) * size
+        # the target cell each cell flows to, -1 where no target can be reached
+        self.source = array('i', [-1]) * size
+        # 1 where the step to the next cell is a teleport rather than a move
+        self.portal = bytearray(size)
+        # target cell index to a list of the target objects on that cell
+        self.targets = {}
+        # flood the field from all the targets at once
+        frontier = []
+        for item in targets:
+            index = grid.index(item.coord)
+            if index not in self.targets:
+                self.targets[index] = []
+                self.seed(index, frontier)
+            self.targets[index].append(item)
+        self.flood(frontier)
+
+    def seed(self, index, frontier):
+        # make a cell a root of the field
+        self.distance[index] = 0
+        self.next[index] = -1
+        self.source[index] = index
+        self.portal[index] = 0
+        heappush(frontier, (0, index))
+
+    def flood(self, frontier):
+        # dijkstra outward from the frontier, following moves and teleporters backwards
+        # a cell is only updated when its cost goes down, so a partial flood repairs the field around it
+        distance, next, source, portal = self.distance, self.next, self.source, self.portal
+        edges, arrivals = self.grid.edges, self.grid.arrivals
+        while len(frontier) > 0:
+            cost, current = heappop(frontier)
+            if cost > distance[current]:
+                # stale heap entry
+                continue
+            # moves are symmetric, a cell can step to current if current can step to it
+            for offset, step_cost in edges[current]:
+                previous = current + offset
+                if cost + step_cost < distance[previous]:
+                    distance[previous] = cost + step_cost
+                    next[previous] = current
+                    source[previous] = source[current]
+                    portal[previous] = 0
+                    heappush(frontier, (cost + step_cost, previous))
+            # teleporters are one way, so follow them from their destination back to their sources
+            for previous in arrivals.get(current, ()):
+                if cost < distance[previous]:
+                    distance[previous] = cost
+                    next[previous] = current
+                    source[previous] = source[current]
+                    portal[previous] = 1
+                    heappush(frontier, (cost, previous))
+
+    def change(self, event, item):
+        # ObjectManager watcher, keep the field in step with the target group
+        if event == 'add':
+            self.add(item)
+        elif event == 'remove':
+            self.remove(item)
+
+    def add(self, item):
+        # a new target only lowers costs, flood outward from it over the cells that are now nearer to it
+        index = self.grid.index(item.coord)
+        if index in self.targets:
+            # there is already a target on that cell, the field doesn't change
+            self.targets[index].append(item)
+            return
+        self.targets[index] = [item]
+        frontier = []
+        self.seed(index, frontier)
+        self.flood(frontier)
+
+    def remove(self, item):
+        # only the cells that flowed to a removed target change, clear them and flood back in from their edges
+        index = self.grid.index(item.coord)
+        if index not in self.targets or item not in self.targets[index]:
+            return
+        self.targets[index].remove(item)
+        if len(self.targets[index]) > 0:
+            # other targets remain on that cell, the field doesn't change
+            return
+        del self.targets[index]
+        distance, next, source, portal = self.distance, self.next, self.source, self.portal
+        edges, teleports, arrivals = self.grid.edges, self.grid.teleports, self.grid.arrivals
+        # gather the cells that flowed to the removed target, walking its tree from the root outward
+        region = [index]
+        for current in region:
+            for offset, _ in edges[current]:
+                previous = current + offset
+                if next[previous] == current and not portal[previous]:
+                    region.append(previous)
+            for previous in arrivals.get(current, ()):
+                if next[previous] == current and portal[previous]:
+                    region.append(previous)
+        for current in region:
+            distance[current] = self.unreached
+            next[current] = -1
+            source[current] = -1
+        # seed each cleared cell from its cheapest neighbour outside the region
+        frontier = []
+        for current in region:
+            for offset, step_cost in edges[current]:
+                neighbour = current + offset
+                if source[neighbour] != -1 and distance[neighbour] + step_cost < distance[current]:
+                    distance[current] = distance[neighbour] + step_cost
+                    next[current] = neighbour
+                    source[current] = source[neighbour]
+                    portal[current] = 0
+            neighbour = teleports.get(current)
+            if neighbour != None and source[neighbour] != -1 and distance[neighbour] < distance[current]:
+                distance[current] = distance[neighbour]
+                next[current] = neighbour
+                source[current] = source[neighbour]
+                portal[current] = 1
+            if source[current] != -1:
+                heappush(frontier, (distance[current], current))
+        self.flood(frontier)
+
+    def path(self, position):
+        # read the path from a cell to its nearest target as Waypoints, the same as Solver.find_path
+        # returns (path, target object), or (None, None) when no target can be reached
+        grid = self.grid
+        current = grid.index(position)
+        if self.source[current] == -1:
+            return None, None
+        goal_object = self.targets[self.source[current]][0]
+        # walk the flow forward to the target
+        steps = []
+        while self.next[current] != -1:
+            if self.portal[current]:
+                steps.append(('teleport', grid.position(self.next[current])))
+            else:
+                steps.append(('move', grid.position(self.next[current])))
+            current = self.next[current]
+        # is there a teleporter at the goal?
+        if current in grid.teleports:
+            steps.append(('teleport', grid.position(grid.teleports[current])))
+        return Waypoints(position, steps), goal_object
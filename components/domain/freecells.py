@@ -0,0 +1,125 @@
+from random import randrange, choice
+
+class FreeCells:
+    # the cells no domain object is on, pooled per area and tile gid so a free cell of a gid can be drawn
+    # uniformly at random in constant time however crowded the map is, instead of drawing any cell and
+    # retrying until one is free
+    # an area is the grid's label for the cells connected by moves alone, so every area is on one floor and
+    # inside one region, and a draw from a floor or a region is a draw from whole pools with nothing turned down
+    # each pool is a list with a key:value -> cell:place_in_its_list map beside it, so a cell is taken out
+    # by moving the last cell of the list into its place
+    # random draws a rect turns down before falling back to going through every cell
+    tries = 16
+
+    def __init__(self, map_object, floor_tiles, object_manager, solver):
+        self.map_object = map_object
+        self.floor_tiles = floor_tiles
+        # the solver's grid has the area and region labels, regions change with the teleporters
+        self.solver = solver
+        grid = solver.get_grid()
+        # area labels don't change with the teleporters, so the ones the grid has now are kept
+        self.areas = grid.areas
+        # key:value -> floor:list_of areas on that floor, wall cells are in an area of -1 - floor
+        self.floor_areas = {}
+        # a cell index in each area, to read the area's region from the grid, and the floor of each area
+        self.area_cells = [None] * grid.area_count
+        self.area_floors = [None] * grid.area_count
+        for index in range(grid.width * grid.height):
+            area = self.areas[index]
+            if area != -1 and self.area_cells[area] == None:
+                self.area_cells[area] = index
+                self.area_floors[area] = grid.floor(index)
+                self.floor_areas.setdefault(grid.floor(index), []).append(area)
+        for floor in range(grid.width // floor_tiles):
+            self.floor_areas.setdefault(floor, []).append(-1 - floor)
+        # key:value -> region:list_of areas in it, for the grid it was made from
+        self.region_grid = None
+        self.region_areas = {}
+        # key:value -> (area, gid):list_of free cell coordinates
+        self.pools = {}
+        # key:value -> cell coordinate:index in its pool
+        self.places = {}
+        for y in range(map_object.height):
+            for x in range(map_object.width):
+                if not object_manager.occupied((x, y)):
+                    self.add((x, y))
+        # kept up to date from here on as cells fill and empty
+        object_manager.watch_cells(self.change)
+
+    def key(self, cell):
+        # the pool a cell belongs in
+        x, y = cell
+        area = self.areas[(y * self.map_object.width) + x]
+        if area == -1:
+            area = -1 - (x // self.floor_tiles)
+        return area, self.map_object.get_tile_gid(x, y, 0)
+
+    def add(self, cell):
+        # a cell became free
+        pool = self.pools.setdefault(self.key(cell), [])
+        self.places[cell] = len(pool)
+        pool.append(cell)
+
+    def remove(self, cell):
+        # a cell was filled, swap the last cell of its pool into its place
+        pool = self.pools[self.key(cell)]
+        place = self.places.pop(cell)
+        last = pool.pop()
+        if last != cell:
+            pool[place] = last
+            self.places[last] = place
+
+    def change(self, cell, occupied):
+        # ObjectManager cell watcher, called when a cell gains its first object or loses its last one
+        if occupied:
+            if cell in self.places:
+                self.remove(cell)
+        elif cell not in self.places:
+            x, y = cell
+            if 0 <= x < self.map_object.width and 0 <= y < self.map_object.height:
+                self.add(cell)
+
+    def areas_in(self, region):
+        # the areas of a region, regrouped when the teleporters change the grid's regions
+        grid = self.solver.get_grid()
+        if grid is not self.region_grid:
+            self.region_grid = grid
+            self.region_areas = {}
+            for area, index in enumerate(self.area_cells):
+                self.region_areas.setdefault(grid.regions[index], []).append(area)
+        return self.region_areas.get(region, ())
+
+    def sample(self, gid, x_min, y_min, width, height, region=None):
+        # a uniformly random free cell of a tile gid inside a rect of cells, and in a region when it's
+        # given, or None when there is no such cell
+        first_floor, last_floor = x_min // self.floor_tiles, (x_min + width - 1) // self.floor_tiles
+        if region == None:
+            areas = [area for floor in range(first_floor, last_floor + 1) for area in self.floor_areas.get(floor, ())]
+        else:
+            areas = [area for area in self.areas_in(region) if first_floor <= self.area_floors[area] <= last_floor]
+        pools = []
+        for area in areas:
+            if len(self.pools.get((area, gid), ())) > 0:
+                pools.append(self.pools[(area, gid)])
+        total = sum(len(pool) for pool in pools)
+        if total == 0:
+            return None
+        def wanted(cell):
+            # inside the rect
+            x, y = cell
+            return x >= x_min and y >= y_min and x < x_min + width and y < y_min + height
+        for _ in range(self.tries):
+            # an area chosen by the size of its pool, then a cell in it, is uniform over all the pools
+            pick = randrange(total)
+            for pool in pools:
+                if pick < len(pool):
+                    cell = pool[pick]
+                    break
+                pick -= len(pool)
+            if wanted(cell):
+                return cell
+        # most of the free cells are outside the rect, choose among the ones that aren't
+        cells = [cell for pool in pools for cell in pool if wanted(cell)]
+        if len(cells) == 0:
+            return None
+        return choice(cells)
@@ -0,0 +1,187 @@
+from copy import copy
+from array import array
+
+class Grid:
+    # compact tables of the walkable cells of a map, built once when the map is loaded so that
+    # expanding a cell during a search is a table lookup instead of tile gid reads
+    # cells are flat indexes, index = (y * width) + x
+    # directions are (delta x, delta y, move cost) in the order a search expands them, the order affects
+    # how straight the paths are, and the position of a direction in the tuple is its bit in a moves mask
+    directions = ((0, -1, 10), (1, 0, 10), (0, 1, 10), (-1, 0, 10),
+                  (1, -1, 14), (1, 1, 14), (-1, 1, 14), (-1, -1, 14))
+
+    def __init__(self, map_object, floor_gid, floor_tiles, teleporters, costs=None):
+        # map dimensions in cells
+        self.width, self.height = map_object.width, map_object.height
+        # width of a floor in cells, floors are side by side along the x axis
+        self.floor_tiles = floor_tiles
+        size = self.width * self.height
+        # costs is key:value -> gid:traversal cost, a tile with a cost is walkable as well as the floor tile
+        # and a cost of 1 is the same as the floor tile, so 2 is terrain that takes twice as long to cross
+        if costs == None:
+            costs = {}
+        costs = dict(costs)
+        costs.setdefault(floor_gid, 1)
+        for gid, cost in costs.items():
+            if type(cost) != int or cost < 1:
+                raise Exception(f'Tile cost: {cost} for gid {gid} must be a whole number of at least 1')
+        # one byte per cell, 1 where the cell is walkable
+        self.walkable = bytearray(size)
+        # one byte per cell, the traversal cost of the cell, 0 for walls
+        self.cell_costs = bytearray(size)
+        for y in range(self.height):
+            for x in range(self.width):
+                cost = costs.get(map_object.get_tile_gid(x, y, 0))
+                if cost != None:
+                    self.walkable[(y * self.width) + x] = 1
+                    self.cell_costs[(y * self.width) + x] = min(cost, 255)
+        # whether any walkable cell costs more than the floor tile
+        self.weighted = any(cost > 1 for cost in self.cell_costs)
+        # flat index offset of each direction
+        self.offsets = tuple((dy * self.width) + dx for dx, dy, _ in self.directions)
+        # one byte per cell, a bit is set for each direction that is a legal move from that cell
+        self.moves = bytearray(size)
+        for y in range(self.height):
+            for x in range(self.width):
+                if self.walkable[(y * self.width) + x]:
+                    self.moves[(y * self.width) + x] = self.legal_moves(x, y)
+        # for each of the 256 possible masks, the (index offset, move cost) pairs of its moves
+        self.steps = []
+        for mask in range(256):
+            steps = []
+            for bit, (_, _, cost) in enumerate(self.directions):
+                if mask & (1 << bit):
+                    steps.append((self.offsets[bit], cost))
+            self.steps.append(tuple(steps))
+        # for each cell, the (index offset, move cost) pairs of its moves, where the cost of a move is the
+        # direction's cost scaled by the average of the two cells' costs, so a move costs the same both ways
+        # equal tuples are shared, so an unweighted map has no more distinct tuples than steps
+        self.edges = []
+        shared = {}
+        for index in range(size):
+            if self.weighted:
+                edges = tuple((offset, (cost * (self.cell_costs[index] + self.cell_costs[index + offset])) >> 1)
+                              for offset, cost in self.steps[self.moves[index]])
+            else:
+                edges = self.steps[self.moves[index]]
+            self.edges.append(shared.setdefault(edges, edges))
+        # most expensive single move
+        self.max_cost = max((cost for edges in shared for _, cost in edges), default=0)
+        # area label of each cell, -1 for walls, the cells connected by moves alone share a label
+        self.areas, self.area_count = self.label_areas()
+        # teleporter tables and the region labels that depend on them
+        self.set_teleporters(teleporters)
+
+    def set_teleporters(self, teleporters):
+        # build the teleporter tables from a list of (source, destination) cell coordinates and join the
+        # areas they connect into regions
+        # teleporter source index to destination index
+        self.teleports = {}
+        # and the reverse, teleporter destination index to a list of the source indexes that arrive there
+        self.arrivals = {}
+        for position, destination in teleporters:
+            # a cell off the map would index into some other cell, or wrap around from the end
+            for x, y in (position, destination):
+                if x < 0 or y < 0 or x >= self.width or y >= self.height:
+                    raise Exception(f'Teleporter: {position} to {destination} is outside the map')
+            self.teleports[self.index(position)] = self.index(destination)
+            self.arrivals.setdefault(self.index(destination), []).append(self.index(position))
+        # region label of each cell, -1 for walls, two cells with different labels can't reach each other
+        self.regions = self.label_regions()
+
+    def with_teleporters(self, teleporters):
+        # a copy with a new list of teleporters, the walkability and moves tables don't change with them
+        # so they are shared, and only the teleporter tables and region labels are rebuilt
+        grid = copy(self)
+        grid.set_teleporters(teleporters)
+        return grid
+
+    def frozen(self):
+        # a copy whose tables can't be changed, to share with worker threads or send to worker processes
+        grid = copy(self)
+        grid.walkable = bytes(self.walkable)
+        grid.moves = bytes(self.moves)
+        grid.cell_costs = bytes(self.cell_costs)
+        grid.edges = tuple(self.edges)
+        grid.regions = array('i', self.regions)
+        grid.teleports = dict(self.teleports)
+        grid.arrivals = {key: list(value) for key, value in self.arrivals.items()}
+        return grid
+
+    def label_areas(self):
+        # label the cells connected by moves, returns (labels, number of labels)
+        areas = array('i', [-1]) * (self.width * self.height)
+        label = 0
+        for index in range(self.width * self.height):
+            if self.walkable[index] and areas[index] == -1:
+                # flood fill a new label, moves are symmetric so this is the whole area of the cell
+                areas[index] = label
+                stack = [index]
+                while len(stack) > 0:
+                    current = stack.pop()
+                    for offset, _ in self.edges[current]:
+                        if areas[current + offset] == -1:
+                            areas[current + offset] = label
+                            stack.append(current + offset)
+                label += 1
+        return areas, label
+
+    def label_regions(self):
+        # join the area labels at either end of each teleporter
+        # teleporters are joined both ways, so a label is an over-estimate of where a cell can reach
+        # and only a difference in labels is a guarantee that there is no path
+        areas = self.areas
+        # union find over the labels, each label points at its parent and a root points at itself
+        parents = list(range(self.area_count))
+        def root(label):
+            while parents[label] != label:
+                parents[label] = parents[parents[label]]
+                label = parents[label]
+            return label
+        for source, destination in self.teleports.items():
+            if areas[source] != -1 and areas[destination] != -1:
+                parents[root(areas[source])] = root(areas[destination])
+        # relabel every area to its root, numbered from 0 in the order they first appear, areas are
+        # numbered in the order their first cell appears so this is the order of the cells too
+        roots = {}
+        labels = [roots.setdefault(root(label), len(roots)) for label in range(self.area_count)]
+        # walls index the last entry
+        labels.append(-1)
+        return array('i', [labels[label] for label in areas])
+
+    def reachable(self, start, goal):
+        # false when there is certainly no path from the start index to the goal index
+        return self.regions[start] != -1 and self.regions[start] == self.regions[goal]
+
+    def legal_moves(self, x, y):
+        # build the moves mask for a cell, a move must stay on the same floor and land on a floor tile
+        # and a diagonal move may not cut the corner of a wall, so both cells beside it must be floor too
+        mask = 0
+        for bit, (dx, dy, _) in enumerate(self.directions):
+            if not self.open_cell(x, y, x + dx, y + dy):
+                continue
+            if dx != 0 and dy != 0:
+                if not (self.open_cell(x, y, x + dx, y) and self.open_cell(x, y, x, y + dy)):
+                    continue
+            mask |= 1 << bit
+        return mask
+
+    def open_cell(self, x, y, new_x, new_y):
+        # whether new_x and new_y is inside the map, walkable, and on the same floor as x and y
+        if new_x < 0 or new_y < 0 or new_x >= self.width or new_y >= self.height:
+            return False
+        if (new_x // self.floor_tiles) != (x // self.floor_tiles):
+            return False
+        return self.walkable[(new_y * self.width) + new_x] == 1
+
+    def index(self, position):
+        # cell coordinate to flat index
+        return (position[1] * self.width) + position[0]
+
+    def position(self, index):
+        # flat index to cell coordinate
+        return index % self.width, index // self.width
+
+    def floor(self, index):
+        # which floor a flat index is on
+        return (index % self.width) // self.floor_tiles
@@ -0,0 +1,156 @@
+from array import array
+from heapq import heappush, heappop
+
+class Hierarchy:
+    # abstract graph of the teleporters of a map, the nodes are the cells at either end of a teleporter
+    # and the edges are either a teleport or the walking cost between two nodes on the same floor
+    # each node keeps a distance field over its own floor, so a route to another floor is planned over
+    # the small abstract graph and each leg of it is read back from a field instead of searched for
+    # cost of a cell a node can't walk to
+    unreached = 0x7fffffff
+
+    def __init__(self, grid, previous=None):
+        # previous is the hierarchy of the same map before its teleporters changed, the fields only
+        # depend on the moves so they are kept, and only the floors whose endpoints changed are relinked
+        self.grid = grid
+        # size of a floor in cells
+        self.floor_size = grid.floor_tiles * grid.height
+        # every teleporter source and destination cell
+        self.endpoints = set(grid.teleports.keys()) | set(grid.teleports.values())
+        # key:value -> floor:list_of_endpoints on that floor
+        self.floor_endpoints = {}
+        for endpoint in sorted(self.endpoints):
+            self.floor_endpoints.setdefault(grid.floor(endpoint), []).append(endpoint)
+        # key:value -> endpoint:walking cost from every cell of its floor to it, indexed by floor_index
+        self.fields = {}
+        for endpoint in self.endpoints:
+            if previous != None and endpoint in previous.fields:
+                self.fields[endpoint] = previous.fields[endpoint]
+            else:
+                self.fields[endpoint] = self.flood(endpoint)
+        # key:value -> endpoint:list_of (endpoint, walking cost) to the others on its floor it can reach
+        self.edges = {}
+        for endpoint in self.endpoints:
+            floor = grid.floor(endpoint)
+            if previous != None and previous.floor_endpoints.get(floor) == self.floor_endpoints[floor]:
+                # the same endpoints on this floor as before, so the same links
+                self.edges[endpoint] = previous.edges[endpoint]
+                continue
+            self.edges[endpoint] = []
+            for other in self.floor_endpoints[floor]:
+                cost = self.fields[other][self.floor_index(endpoint)]
+                if other != endpoint and cost != self.unreached:
+                    self.edges[endpoint].append((other, cost))
+
+    def floor_index(self, index):
+        # map index to an index within its floor
+        x, y = index % self.grid.width, index // self.grid.width
+        return (y * self.grid.floor_tiles) + (x % self.grid.floor_tiles)
+
+    def flood(self, source):
+        # dijkstra from a cell by moves alone, which never leave a floor, into a distance field of its floor
+        # moves are symmetric so the field is also the walking cost from every cell to the source
+        edges = self.grid.edges
+        field = array('i', [self.unreached]) * self.floor_size
+        field[self.floor_index(source)] = 0
+        frontier = [(0, source)]
+        while len(frontier) > 0:
+            cost, current = heappop(frontier)
+            if cost > field[self.floor_index(current)]:
+                continue
+            for offset, step_cost in edges[current]:
+                local = self.floor_index(current + offset)
+                if cost + step_cost < field[local]:
+                    field[local] = cost + step_cost
+                    heappush(frontier, (cost + step_cost, current + offset))
+        return field
+
+    def plan(self, start, goals):
+        # plan the cheapest route from a start cell to the nearest goal cell, the goals must all be on
+        # other floors than the start
+        # a generator that yields the number of abstract nodes it settled, the same as a search yields the
+        # cells it expanded, and returns (route, goal) where route is a list of (from cell, to cell, 'walk'
+        # or 'teleport') legs in forward order, or None when no goal can be reached
+        grid = self.grid
+        start_local = self.floor_index(start)
+        # key:value -> floor:list_of_goals on that floor
+        floor_goals = {}
+        for goal in goals:
+            floor_goals.setdefault(grid.floor(goal), []).append(goal)
+        # dijkstra over the abstract graph, a goal is the node ('goal', cell) so it can't be mistaken for an endpoint
+        frontier = []
+        counter = 0
+        came_from = {}
+        best = {}
+        def relax(node, cost, previous, kind):
+            nonlocal counter
+            if node not in best or cost < best[node]:
+                best[node] = cost
+                came_from[node] = (previous, kind)
+                counter += 1
+                heappush(frontier, (cost, counter, node))
+        # walk out from the start to the endpoints on its floor
+        for endpoint in self.floor_endpoints.get(grid.floor(start), []):
+            cost = self.fields[endpoint][start_local]
+            if cost != self.unreached:
+                relax(endpoint, cost, start, 'walk')
+        settled = set()
+        while len(frontier) > 0:
+            cost, _, current = heappop(frontier)
+            if current in settled:
+                continue
+            settled.add(current)
+            if type(current) == tuple:
+                # the nearest goal, follow the route back to the start
+                route = []
+                node = current
+                while node != start:
+                    previous, kind = came_from[node]
+                    if type(node) == tuple:
+                        route.append((previous, node[1], kind))
+                    else:
+                        route.append((previous, node, kind))
+                    node = previous
+                route.reverse()
+                yield len(settled)
+                return route, current[1]
+            if current in grid.teleports:
+                # teleporting costs nothing extra
+                relax(grid.teleports[current], cost, current, 'teleport')
+            for other, walk_cost in self.edges[current]:
+                relax(other, cost + walk_cost, current, 'walk')
+            # walk from here to the goals on this floor
+            field = self.fields[current]
+            for goal in floor_goals.get(grid.floor(current), ()):
+                walk_cost = field[self.floor_index(goal)]
+                if walk_cost != self.unreached:
+                    relax(('goal', goal), cost + walk_cost, current, 'walk')
+        yield len(settled)
+        return None
+
+    def walk(self, source, destination):
+        # read a walking leg of a route from the fields, one of the two cells must be an endpoint
+        # returns the cells from after source up to and including destination
+        if destination in self.fields:
+            # step downhill on the destination field from the source
+            return self.descend(source, self.fields[destination])
+        # otherwise step downhill on the source field from the destination, then turn the cells around
+        cells = [destination] + self.descend(destination, self.fields[source])
+        cells.pop()
+        cells.reverse()
+        return cells
+
+    def descend(self, current, field):
+        # follow a field from a cell to its root, returns the cells stepped to
+        edges = self.grid.edges
+        cells = []
+        cost = field[self.floor_index(current)]
+        while cost > 0:
+            # the first neighbour in expansion order that is on a cheapest path, which keeps paths straight
+            for offset, step_cost in edges[current]:
+                if field[self.floor_index(current + offset)] == cost - step_cost:
+                    current += offset
+                    cost -= step_cost
+                    break
+            cells.append(current)
+        return cells
@@ -0,0 +1,118 @@
+from array import array
+from heapq import heappush, heappop
+
+class Landmarks:
+    # exact costs between a few landmark cells and every cell of the map, both to and from each landmark
+    # since teleporters are one way, so a search can bound the cost between any two cells by the
+    # triangle inequality, d(v, t) >= d(v, L) - d(t, L) and d(v, t) >= d(L, t) - d(L, v)
+    # costs are kept in unsigned 16 bit arrays, a cost too large to fit is stored as saturated and is
+    # only ever used where a smaller stored value still gives a lower bound
+    saturated, unreached = 0xfffe, 0xffff
+    # most landmarks kept, each one is two tables of two bytes per cell
+    limit = 16
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.cells = self.choose()
+        # per landmark, cost from every cell to it and cost from it to every cell
+        self.to_tables = [self.flood(cell, True) for cell in self.cells]
+        self.from_tables = [self.flood(cell, False) for cell in self.cells]
+
+    def choose(self):
+        # the teleporter endpoints and the walkable cell nearest each corner of each floor
+        grid = self.grid
+        candidates = []
+        for source, destination in grid.teleports.items():
+            candidates += [source, destination]
+        floors = grid.width // grid.floor_tiles
+        for floor in range(floors):
+            left, right = floor * grid.floor_tiles, ((floor + 1) * grid.floor_tiles) - 1
+            for corner_x, corner_y in ((left, 0), (right, 0), (left, grid.height - 1), (right, grid.height - 1)):
+                nearest = None
+                for y in range(grid.height):
+                    for x in range(left, right + 1):
+                        if grid.walkable[grid.index((x, y))]:
+                            distance = max(abs(x - corner_x), abs(y - corner_y))
+                            if nearest == None or distance < nearest[0]:
+                                nearest = (distance, grid.index((x, y)))
+                if nearest != None:
+                    candidates.append(nearest[1])
+        # unique, in the order found
+        cells = list(dict.fromkeys(candidates))
+        if len(cells) <= self.limit:
+            return cells
+        # too many, keep a spread of them, each next one is the candidate farthest from those kept so far
+        # where cells on different floors count as farther apart than any two on the same floor
+        def apart(first, second):
+            if grid.floor(first) != grid.floor(second):
+                return grid.width + grid.height
+            (x1, y1), (x2, y2) = grid.position(first), grid.position(second)
+            return max(abs(x1 - x2), abs(y1 - y2))
+        kept = [cells[0]]
+        while len(kept) < self.limit:
+            kept.append(max((cell for cell in cells if cell not in kept),
+                            key=lambda cell: min(apart(cell, other) for other in kept)))
+        return kept
+
+    def flood(self, landmark, towards):
+        # dijkstra from a landmark, towards is the cost from each cell to it, which takes teleporters backwards
+        grid = self.grid
+        edges, teleports, arrivals = grid.edges, grid.teleports, grid.arrivals
+        size = grid.width * grid.height
+        # full costs while flooding, the table only keeps them as far as they fit
+        costs = [-1] * size
+        costs[landmark] = 0
+        frontier = [(0, landmark)]
+        while len(frontier) > 0:
+            cost, current = heappop(frontier)
+            if cost > costs[current]:
+                continue
+            # moves are symmetric, only the teleporters differ between the two directions
+            for offset, step_cost in edges[current]:
+                neighbour, new_cost = current + offset, cost + step_cost
+                if costs[neighbour] < 0 or new_cost < costs[neighbour]:
+                    costs[neighbour] = new_cost
+                    heappush(frontier, (new_cost, neighbour))
+            if towards:
+                hops = arrivals.get(current, ())
+            elif current in teleports:
+                hops = (teleports[current],)
+            else:
+                hops = ()
+            for neighbour in hops:
+                if costs[neighbour] < 0 or cost < costs[neighbour]:
+                    costs[neighbour] = cost
+                    heappush(frontier, (cost, neighbour))
+        saturated, unreached = self.saturated, self.unreached
+        return array('H', [unreached if cost < 0 else min(cost, saturated) for cost in costs])
+
+    def estimate(self, start, goal, count):
+        # an admissible and consistent lower bound on the cost from any cell to goal, from the count
+        # landmarks that give the best bound at start, returns a function of a cell index that gives
+        # the bound or None when the tables show the cell can't reach the goal
+        saturated, unreached = self.saturated, self.unreached
+        terms = []
+        for to_table, from_table in zip(self.to_tables, self.from_tables):
+            terms.append((to_table, to_table[goal], from_table, from_table[goal]))
+        def bound(index, terms):
+            best = 0
+            for to_table, to_goal, from_table, from_goal in terms:
+                to_landmark = to_table[index]
+                if to_landmark == unreached:
+                    if to_goal != unreached:
+                        # the goal reaches the landmark and this cell doesn't, so it can't reach the goal
+                        return None
+                elif to_goal < saturated and to_landmark - to_goal > best:
+                    best = to_landmark - to_goal
+                from_landmark = from_table[index]
+                if from_goal == unreached:
+                    if from_landmark != unreached:
+                        # the landmark reaches this cell and not the goal, so this cell can't reach the goal
+                        return None
+                elif from_landmark < saturated and from_goal - from_landmark > best:
+                    best = from_goal - from_landmark
+            return best
+        # the landmarks that bound the start best are the ones worth checking for every cell
+        terms.sort(key=lambda term: -(bound(start, [term]) or 0))
+        terms = terms[:count]
+        return lambda index: bound(index, terms)
@@ -0,0 +1,53 @@
+from collections import OrderedDict
+from threading import Lock
+
+class PathCache:
+    # least recently used cache of solved paths, key is (start index, frozenset of goal indexes)
+    # and value is (path, goal index, version), an entry made before the last invalidate is stale
+    def __init__(self, capacity=256):
+        # most entries kept, the least recently used is dropped past this
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        # bumped whenever the map or the teleporters change, which makes every existing entry stale
+        self.version = 0
+        # lookups that were answered and lookups that weren't, to see whether the cache pays for itself
+        self.hits = self.misses = 0
+        # worker threads store their results, so entries are only changed while holding the lock
+        self.lock = Lock()
+
+    def key(self, start, goals):
+        # goal order doesn't change which goal is nearest so it's left out of the key
+        return start, frozenset(goals)
+
+    def get(self, key):
+        # return (path, goal index) for a key, or None on a miss
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry == None or entry[2] != self.version:
+                if entry != None:
+                    # stale, made before the last invalidate
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, key, path, goal, version):
+        # store a result solved at version, a result solved before the last invalidate isn't kept
+        with self.lock:
+            if version != self.version:
+                return
+            self.entries[key] = (path, goal, version)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def invalidate(self):
+        # every entry made so far is stale
+        with self.lock:
+            self.version += 1
+
+    def stats(self):
+        # (hits, misses, entries) counters
+        return self.hits, self.misses, len(self.entries)
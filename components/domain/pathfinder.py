@@ -0,0 +1,609 @@
+from heapq import heappush, heappop
+from collections import deque
+from .hierarchy import Hierarchy
+from .landmarks import Landmarks
+from .waypoints import Waypoints
+from .scratch import Scratch
+
+class Pathfinder:
+    # the searches of the solver over a grid, working in flat cell indexes
+    # it holds no pygame or pytmx objects, so a snapshot of it can be handed to a worker thread or process
+    # cost of a straight and a diagonal move, diagonals are sqrt(2) scaled to integers
+    straight_cost, diagonal_cost = 10, 14
+    # past this many destinations the per-cell heuristic costs more than it saves and a dijkstra is used
+    heuristic_limit = 16
+    # whether searches to another floor are planned over the teleporter graph first
+    hierarchical = True
+    # whether a single goal is searched for from both ends at once, off by default because with the
+    # portal bounded heuristic a one sided a* already expands little more than the path itself
+    bidirectional = False
+    # number of cells a search expands between yields when it is run a slice at a time
+    slice_nodes = 64
+    # number of landmarks whose bounds a single goal search checks per cell, the ones that bound its start best
+    landmark_terms = 4
+    # search strategies, 'astar' expands every cell and 'jps' jumps over open floor between jump points
+    strategies = ('astar', 'jps')
+    # straight directions to either side of each straight direction, as bits of the moves mask
+    sides = ((1, 3), (0, 2), (1, 3), (0, 2))
+    # the straight directions that make up each diagonal direction, bit 4 is north east and so on
+    parts = {4: (0, 1), 5: (2, 1), 6: (2, 3), 7: (0, 3)}
+    # the diagonal between two straight directions
+    diagonals = {(0, 1): 4, (2, 1): 5, (2, 3): 6, (0, 3): 7,
+                 (1, 0): 4, (1, 2): 5, (3, 2): 6, (3, 0): 7}
+
+    def __init__(self, grid, hierarchy=None, strategy='astar', landmarks=None):
+        # walkability and moves tables
+        self.grid = grid
+        if strategy not in self.strategies:
+            raise Exception(f'Strategy: {strategy} not recognized')
+        self.strategy = strategy
+        # landmark cost tables, like the hierarchy they only change with the map so they're shared by copies
+        # they are built along with the hierarchy when neither is given, None goes without them
+        if hierarchy == None and landmarks == None:
+            landmarks = Landmarks(grid)
+        self.landmarks = landmarks
+        # the teleporter graph, with walking costs between the teleporters on each floor
+        if hierarchy == None:
+            hierarchy = Hierarchy(grid)
+        self.hierarchy = hierarchy
+        # Scratch arrays not in use by a search, a search takes one and gives it back when it ends so
+        # searches that are interleaved by the scheduler or run on worker threads never share one
+        self.scratch = []
+
+    def snapshot(self):
+        # a copy over a frozen copy of the grid, safe to hand to a worker while the game carries on
+        return Pathfinder(self.grid.frozen(), self.hierarchy, self.strategy, self.landmarks)
+
+    def find(self, start, goals):
+        # solve a path from a start index to the nearest of a list of goal indexes
+        # returns (path, goal index) or (None, None) when no goal can be reached
+        return self.complete(self.solve(start, goals))
+
+    def complete(self, job):
+        # run a solving generator to the end and return its result
+        while True:
+            try:
+                next(job)
+            except StopIteration as stop:
+                return stop.value
+
+    def acquire(self):
+        # a free Scratch, or a new one when every one made so far is in use
+        try:
+            return self.scratch.pop()
+        except IndexError:
+            return Scratch(self.grid.width * self.grid.height)
+
+    def release(self, scratch):
+        # give a Scratch back for the next search
+        self.scratch.append(scratch)
+
+    def solve(self, start, goals):
+        # find as a generator, it yields the number of cells expanded every slice_nodes cells
+        # so a scheduler can spread one search over several frames, and it returns (path, goal index)
+        grid = self.grid
+        # goals in another region are never reached, so leave them out and give up at once if none are left
+        goals = [index for index in goals if grid.reachable(start, index)]
+        if len(goals) == 0:
+            return None, None
+        if self.hierarchical and len(grid.teleports) > 0:
+            # when every goal is on another floor the route is planned over the teleporter graph
+            start_floor = grid.floor(start)
+            if all(grid.floor(index) != start_floor for index in goals):
+                return (yield from self.find_hierarchical(start, goals))
+        # the scratch is given back however the search ends, including a cancelled search whose
+        # generator is closed before it finishes
+        scratch = self.acquire()
+        try:
+            if self.strategy == 'jps' and not grid.weighted:
+                # jumps assume every move in a direction costs the same, so weighted maps use a*
+                goal = yield from self.jump_search(start, goals, scratch)
+            elif self.bidirectional and len(goals) == 1:
+                goal = yield from self.bidirectional_search(start, goals[0], scratch)
+            elif len(goals) > self.heuristic_limit:
+                goal = yield from self.bucket_search(start, goals, scratch)
+            else:
+                goal = yield from self.search(start, goals, scratch)
+            if goal != None:
+                # waypoints from the start to the goal
+                return self.build_path(start, goal, scratch), goal
+            else:
+                # no valid path found
+                return None, None
+        finally:
+            self.release(scratch)
+
+    def find_hierarchical(self, start, goals):
+        # plan the route over the teleporter graph, then read each leg that walks across a floor from it
+        # same generator protocol as solve, it yields the abstract nodes the plan settled and then the
+        # cells each leg steps over as it is read
+        plan = yield from self.hierarchy.plan(start, goals)
+        if plan == None:
+            # no valid path found
+            return None, None
+        route, goal = plan
+        position = self.grid.position
+        # join the legs in forward order
+        path = []
+        for source, destination, kind in route:
+            if kind == 'teleport':
+                path.append(('teleport', position(destination)))
+            else:
+                cells = self.hierarchy.walk(source, destination)
+                for cell in cells:
+                    path.append(('move', position(cell)))
+                yield len(cells)
+        # is there a teleporter at the goal?
+        if goal in self.grid.teleports:
+            path.append(('teleport', position(self.grid.teleports[goal])))
+        return Waypoints(position(start), path), goal
+
+    def search(self, start, goals, scratch):
+        # search from a start index to the nearest of a list of goal indexes
+        # one goal is an a* search, more than one is a multi-target a* with the heuristic taken
+        # over the whole goal set, and past heuristic_limit goals it is a dijkstra search, though
+        # solve uses bucket_search for those
+        # a generator that yields the number of cells expanded every slice_nodes cells, and
+        # returns the goal reached, whose path is left in scratch, or None when no goal can be reached
+        grid = self.grid
+        cell_edges, teleports = grid.edges, grid.teleports
+        # goal cells as a set so the goal test is one lookup however many destinations there are
+        goal_set = set(goals)
+        if len(goals) <= self.heuristic_limit:
+            heuristic = self.heuristic(goals, start=start)
+        else:
+            heuristic = None
+        # per-cell state lives in the scratch arrays, stamped with this search's generation
+        generation = scratch.begin()
+        parent, cost, seen, closed, teleported = scratch.parent, scratch.cost, scratch.seen, scratch.closed, scratch.teleported
+        seen[start], cost[start], parent[start], teleported[start] = generation, 0, -1, 0
+        # frontier is a binary heap of (estimated total cost, tie breaker, cell) tuples
+        frontier = [(0, 0, start)]
+        # tie breaker keeps insertion order between equal costs, which keeps the paths straight
+        counter = 0
+        goal = None
+        # cells expanded since the last yield
+        expanded = 0
+        while len(frontier) > 0:
+            # get the frontier cell with the lowest estimated total cost
+            current = heappop(frontier)[2]
+            if closed[current] == generation:
+                # stale heap entry for a cell that was already reached more cheaply
+                continue
+            closed[current] = generation
+            expanded += 1
+            if expanded == self.slice_nodes:
+                # hand control back to the caller between slices
+                yield expanded
+                expanded = 0
+            # is that cell a goal
+            if current in goal_set:
+                goal = current
+                break
+            current_cost = cost[current]
+            # legal moves from the current cell as (index offset, step cost) edges
+            edges = cell_edges[current]
+            # a teleporter is a portal edge that costs nothing extra to take, the only edge with no cost
+            if current in teleports:
+                edges = edges + ((teleports[current] - current, 0),)
+            for offset, step_cost in edges:
+                new_position = current + offset
+                if closed[new_position] == generation:
+                    continue
+                new_cost = current_cost + step_cost
+                # only keep the neighbour if this is the cheapest way found to it so far
+                if seen[new_position] != generation or new_cost < cost[new_position]:
+                    if heuristic == None:
+                        estimate = 0
+                    else:
+                        estimate = heuristic(new_position)
+                        if estimate == None:
+                            # no destination can be reached from this cell
+                            continue
+                    seen[new_position] = generation
+                    cost[new_position] = new_cost
+                    # track the flow of the cell, and whether it was reached through a teleporter
+                    parent[new_position] = current
+                    teleported[new_position] = step_cost == 0
+                    counter += 1
+                    heappush(frontier, (new_cost + estimate, counter, new_position))
+        # account for the last partial slice
+        yield expanded
+        return goal
+
+    def bucket_search(self, start, goals, scratch):
+        # dijkstra with a bucket queue, used when there are too many goals for the heuristic to pay
+        # move costs are whole numbers and none is more than the grid's max_cost, so every cell on the
+        # frontier costs within max_cost of the cheapest, and a ring of max_cost + 1 buckets indexed by
+        # cost holds the whole frontier with no heap operations, each bucket is first in first out
+        # which keeps the paths straight the same as the heap tie breaker does
+        # same generator protocol and result as search
+        grid = self.grid
+        cell_edges, teleports = grid.edges, grid.teleports
+        goal_set = set(goals)
+        generation = scratch.begin()
+        parent, cost, seen, closed, teleported = scratch.parent, scratch.cost, scratch.seen, scratch.closed, scratch.teleported
+        seen[start], cost[start], parent[start], teleported[start] = generation, 0, -1, 0
+        ring = grid.max_cost + 1
+        buckets = [deque() for _ in range(ring)]
+        buckets[0].append(start)
+        # entries in the buckets, including stale ones
+        pending = 1
+        # cost of the bucket being emptied
+        current_cost = 0
+        goal = None
+        expanded = 0
+        while pending > 0:
+            bucket = buckets[current_cost % ring]
+            if len(bucket) == 0:
+                current_cost += 1
+                continue
+            current = bucket.popleft()
+            pending -= 1
+            if closed[current] == generation or cost[current] != current_cost:
+                # stale entry for a cell that was since reached more cheaply
+                continue
+            closed[current] = generation
+            expanded += 1
+            if expanded == self.slice_nodes:
+                yield expanded
+                expanded = 0
+            if current in goal_set:
+                goal = current
+                break
+            edges = cell_edges[current]
+            # a teleporter costs nothing, so its destination goes in the bucket being emptied
+            if current in teleports:
+                edges = edges + ((teleports[current] - current, 0),)
+            for offset, step_cost in edges:
+                new_position = current + offset
+                if closed[new_position] == generation:
+                    continue
+                new_cost = current_cost + step_cost
+                if seen[new_position] != generation or new_cost < cost[new_position]:
+                    seen[new_position] = generation
+                    cost[new_position] = new_cost
+                    parent[new_position] = current
+                    teleported[new_position] = step_cost == 0
+                    buckets[new_cost % ring].append(new_position)
+                    pending += 1
+        yield expanded
+        return goal
+
+    def bidirectional_search(self, start, goal, scratch):
+        # a* from the start and from the goal at once, the goal side follows moves and teleporters
+        # backwards, and the two meet somewhere in the middle so each covers about half the distance
+        # both sides use the average of the two estimates as their potential so that they agree on the
+        # cost of every cell, keys are doubled to keep them whole numbers
+        # same generator protocol and result as search, the goal side works in a second scratch
+        grid = self.grid
+        cell_edges, teleports, arrivals = grid.edges, grid.teleports, grid.arrivals
+        # estimates of the cost to the goal, and of the cost from the start over the reversed teleporters
+        to_goal = self.heuristic([goal], start=start)
+        from_start = self.heuristic([start], [(destination, source) for source, destination in teleports.items()])
+        # potentials already worked out, cells are often reached from both sides
+        potentials = {}
+        def potential(index):
+            # half the difference of the estimates, doubled, None when a cell can't be on any path
+            if index not in potentials:
+                ahead, behind = to_goal(index), from_start(index)
+                if ahead == None or behind == None:
+                    potentials[index] = None
+                else:
+                    potentials[index] = ahead - behind
+            return potentials[index]
+        backward = self.acquire()
+        try:
+            # per side: scratch and its generation, the parent link is to the cell before on the path for
+            # the start side and to the cell after for the goal side
+            scratches = (scratch, backward)
+            generations = (scratch.begin(), backward.begin())
+            for side, cell in ((0, start), (1, goal)):
+                scratches[side].seen[cell] = generations[side]
+                scratches[side].cost[cell] = 0
+                scratches[side].parent[cell] = -1
+                scratches[side].teleported[cell] = 0
+            frontiers = ([(0, 0, start)], [(0, 0, goal)])
+            counter = 0
+            # cheapest path found so far through a meeting cell
+            best = None
+            meeting = None
+            if start == goal:
+                best, meeting = 0, start
+            expanded = 0
+            while len(frontiers[0]) > 0 and len(frontiers[1]) > 0:
+                # stop when no path through the cells left on the frontiers can be cheaper than the best
+                if best != None and frontiers[0][0][0] + frontiers[1][0][0] >= 2 * best:
+                    break
+                # grow the side with the lower key
+                side = 0 if frontiers[0][0][0] <= frontiers[1][0][0] else 1
+                mine, other = scratches[side], scratches[1 - side]
+                generation, other_generation = generations[side], generations[1 - side]
+                current = heappop(frontiers[side])[2]
+                if mine.closed[current] == generation:
+                    continue
+                mine.closed[current] = generation
+                expanded += 1
+                if expanded == self.slice_nodes:
+                    yield expanded
+                    expanded = 0
+                current_cost = mine.cost[current]
+                # moves are symmetric, teleporters are taken forward by the start side and backward by the goal side
+                edges = cell_edges[current]
+                if side == 0:
+                    if current in teleports:
+                        edges = edges + ((teleports[current] - current, 0),)
+                elif current in arrivals:
+                    edges = edges + tuple((source - current, 0) for source in arrivals[current])
+                for offset, step_cost in edges:
+                    new_position = current + offset
+                    if mine.closed[new_position] == generation:
+                        continue
+                    new_cost = current_cost + step_cost
+                    if mine.seen[new_position] != generation or new_cost < mine.cost[new_position]:
+                        estimate = potential(new_position)
+                        if estimate == None:
+                            continue
+                        mine.seen[new_position] = generation
+                        mine.cost[new_position] = new_cost
+                        mine.parent[new_position] = current
+                        mine.teleported[new_position] = step_cost == 0
+                        counter += 1
+                        heappush(frontiers[side], ((2 * new_cost) + (estimate if side == 0 else -estimate), counter, new_position))
+                        # a cell the other side has reached joins the two halves into a path
+                        if other.seen[new_position] == other_generation:
+                            total = new_cost + other.cost[new_position]
+                            if best == None or total < best:
+                                best, meeting = total, new_position
+            yield expanded
+            if best == None:
+                return None
+            # join the halves into scratch, the goal side links each cell to the one after it so they are turned around
+            cell = meeting
+            while cell != goal:
+                after = backward.parent[cell]
+                scratch.parent[after] = cell
+                # the goal side marks the cell a teleport leaves from, the path marks the cell it arrives at
+                scratch.teleported[after] = backward.teleported[cell]
+                cell = after
+            return goal
+        finally:
+            self.release(backward)
+
+    def jump_search(self, start, goals, scratch):
+        # jump point search, an a* over the jump points of the grid instead of every cell
+        # a run of open floor is crossed in one step from a jump point to the next, and the cells in
+        # between are filled back in once a goal is found, so it returns the same as search
+        # moves masks already encode the no corner cutting rule and the floor edges, so the jumps
+        # and the forced neighbours are read from them, and teleporter sources always stop a jump
+        grid = self.grid
+        moves, offsets, teleports = grid.moves, grid.offsets, grid.teleports
+        sides, parts, diagonals = self.sides, self.parts, self.diagonals
+        goal_set = set(goals)
+        # cells a jump must stop at
+        special = goal_set | set(teleports.keys())
+        if len(goals) <= self.heuristic_limit:
+            heuristic = self.heuristic(goals, start=start)
+        else:
+            heuristic = None
+        def jump(cell, direction):
+            # step from cell in a direction until a jump point, returns (jump point, steps) or None
+            bit = 1 << direction
+            steps = 0
+            while moves[cell] & bit:
+                previous = cell
+                cell += offsets[direction]
+                steps += 1
+                if cell in special:
+                    return cell, steps
+                if direction < 4:
+                    # a side cell that the previous cell couldn't step to is a forced neighbour
+                    for side in sides[direction]:
+                        if moves[cell] & (1 << side) and not moves[previous] & (1 << side):
+                            return cell, steps
+                else:
+                    # a diagonal stops where either of its straight parts would find a jump point
+                    first, second = parts[direction]
+                    if jump(cell, first) != None or jump(cell, second) != None:
+                        return cell, steps
+            return None
+        def directions(current, arrived):
+            # directions to jump in from a jump point given the direction it was reached in
+            mask = moves[current]
+            if arrived == -1:
+                # the start and teleport arrivals have no direction, so try all of them
+                return [direction for direction in range(8) if mask & (1 << direction)]
+            if arrived < 4:
+                # straight on, and the forced neighbours to the sides with the diagonals towards them
+                results = [arrived] if mask & (1 << arrived) else []
+                previous = current - offsets[arrived]
+                for side in sides[arrived]:
+                    if mask & (1 << side) and not moves[previous] & (1 << side):
+                        results.append(side)
+                        diagonal = diagonals[(side, arrived)]
+                        if mask & (1 << diagonal):
+                            results.append(diagonal)
+                return results
+            # a diagonal has no forced neighbours without corner cutting, its two parts and itself
+            return [direction for direction in parts[arrived] + (arrived,) if mask & (1 << direction)]
+        generation = scratch.begin()
+        parent, cost, seen, closed, teleported = scratch.parent, scratch.cost, scratch.seen, scratch.closed, scratch.teleported
+        # direction each jump point was reached in plus one, 0 for none
+        arrived = scratch.direction
+        seen[start], cost[start], parent[start], teleported[start], arrived[start] = generation, 0, -1, 0, 0
+        frontier = [(0, 0, start)]
+        counter = 0
+        goal = None
+        expanded = 0
+        while len(frontier) > 0:
+            current = heappop(frontier)[2]
+            if closed[current] == generation:
+                continue
+            closed[current] = generation
+            expanded += 1
+            if expanded == self.slice_nodes:
+                yield expanded
+                expanded = 0
+            if current in goal_set:
+                goal = current
+                break
+            current_cost = cost[current]
+            # jumps as (jump point, cost, direction reached in) edges
+            edges = []
+            for direction in directions(current, arrived[current] - 1):
+                result = jump(current, direction)
+                if result != None:
+                    cell, steps = result
+                    edges.append((cell, steps * self.directions_cost(direction), direction))
+            # a teleporter is a portal edge that costs nothing extra to take
+            if current in teleports:
+                edges.append((teleports[current], 0, -1))
+            for new_position, step_cost, direction in edges:
+                if closed[new_position] == generation:
+                    continue
+                new_cost = current_cost + step_cost
+                if seen[new_position] != generation or new_cost < cost[new_position]:
+                    if heuristic == None:
+                        estimate = 0
+                    else:
+                        estimate = heuristic(new_position)
+                        if estimate == None:
+                            continue
+                    seen[new_position] = generation
+                    cost[new_position] = new_cost
+                    parent[new_position] = current
+                    arrived[new_position] = direction + 1
+                    teleported[new_position] = direction == -1
+                    counter += 1
+                    heappush(frontier, (new_cost + estimate, counter, new_position))
+        yield expanded
+        if goal == None:
+            return None
+        # fill in the cells between the jump points on the way back from the goal, a jump point's
+        # parent is read before the cells of its jump are written over it
+        cell = goal
+        while cell != start:
+            jumped_from = parent[cell]
+            if not teleported[cell]:
+                offset = -offsets[arrived[cell] - 1]
+                while cell != jumped_from:
+                    parent[cell] = cell + offset
+                    teleported[cell] = 0
+                    cell += offset
+            cell = jumped_from
+        return goal
+
+    def directions_cost(self, direction):
+        # cost of one step in a direction, the first four are straight
+        if direction < 4:
+            return self.straight_cost
+        return self.diagonal_cost
+
+    def build_path(self, start, goal, scratch):
+        # Waypoints between start and goal from the parent links a search left in scratch, in cell coordinates
+        came_from, teleported = scratch.parent, scratch.teleported
+        path = []
+        position = self.grid.position
+        # is there a teleporter at the goal?
+        if goal in self.grid.teleports:
+            # if so, add that teleport to the path
+            path.append(('teleport', position(self.grid.teleports[goal])))
+        # follow the flow back to the start
+        while goal != start:
+            # is this cell a teleport?
+            if teleported[goal]:
+                path.append(('teleport', position(goal)))
+            # otherwise it's a move
+            else:
+                path.append(('move', position(goal)))
+            # follow flow
+            goal = came_from[goal]
+        # the flow was followed from goal to start, turn it around and keep only the waypoints
+        path.reverse()
+        return Waypoints(position(start), path)
+
+    def heuristic(self, goals, links=None, start=None):
+        # build an admissible and consistent estimate of the cost from any cell to the nearest goal
+        # the octile distance is only a bound between cells on the same floor, so other floors are reached
+        # through the teleporters on a cell's own floor, each with a bound on the rest of the way from it
+        # links are the (source, destination) teleporter pairs, reversed for an estimate on the reverse graph
+        # for one goal on the forward graph, given the start, it is the larger of that and the landmark bound
+        # when there are landmark tables
+        grid = self.grid
+        # landmark tables are only for the forward graph
+        forward = links == None
+        if links == None:
+            links = list(grid.teleports.items())
+        width, floor_tiles = grid.width, grid.floor_tiles
+        straight, diagonal = self.straight_cost, self.diagonal_cost
+        def octile(first, second):
+            # lower bound of the cost between two cells on the same floor with no walls in the way
+            dx, dy = abs((first % width) - (second % width)), abs((first // width) - (second // width))
+            if dx < dy:
+                dx, dy = dy, dx
+            return (straight * (dx - dy)) + (diagonal * dy)
+        # bounds is the lower bound from each teleporter source to the nearest goal, solved as a
+        # dijkstra over the teleporters where walking between two cells on a floor costs their octile distance
+        bounds = {}
+        frontier = []
+        for source, destination in links:
+            for goal in goals:
+                if grid.floor(goal) == grid.floor(destination):
+                    cost = octile(destination, goal)
+                    if source not in bounds or cost < bounds[source]:
+                        bounds[source] = cost
+            if source in bounds:
+                heappush(frontier, (bounds[source], source))
+        while len(frontier) > 0:
+            cost, current = heappop(frontier)
+            if cost > bounds[current]:
+                continue
+            for source, destination in links:
+                if grid.floor(destination) == grid.floor(current):
+                    new_cost = cost + octile(destination, current)
+                    if source not in bounds or new_cost < bounds[source]:
+                        bounds[source] = new_cost
+                        heappush(frontier, (new_cost, source))
+        # per floor list of (x, y, extra cost) targets, goals have no extra cost
+        targets = {}
+        for goal in goals:
+            targets.setdefault(grid.floor(goal), []).append((goal % width, goal // width, 0))
+        for source, bound in bounds.items():
+            targets.setdefault(grid.floor(source), []).append((source % width, source // width, bound))
+        # a target that another target on its floor reaches within its extra cost never gives the lowest
+        # bound, by the triangle inequality of the octile distance, so it is left out
+        for floor, floor_targets in targets.items():
+            kept = []
+            for target in sorted(floor_targets, key=lambda target: target[2]):
+                if not any(other[2] + octile((other[1] * width) + other[0], (target[1] * width) + target[0]) <= target[2]
+                           for other in kept):
+                    kept.append(target)
+            targets[floor] = kept
+        def estimate(index):
+            # return the lower bound for a cell, or None when nothing can be reached from its floor
+            best = None
+            x, y = index % width, index // width
+            for target_x, target_y, extra in targets.get(x // floor_tiles, ()):
+                dx, dy = abs(x - target_x), abs(y - target_y)
+                if dx < dy:
+                    dx, dy = dy, dx
+                cost = (straight * (dx - dy)) + (diagonal * dy) + extra
+                if best == None or cost < best:
+                    best = cost
+            return best
+        if start == None or len(goals) != 1 or not forward or self.landmarks == None:
+            return estimate
+        # the larger of two admissible and consistent estimates is both as well
+        landmark = self.landmarks.estimate(start, goals[0], self.landmark_terms)
+        def combined(index):
+            # None when either estimate shows the goal can't be reached from the cell
+            portal = estimate(index)
+            if portal == None:
+                return None
+            bound = landmark(index)
+            if bound == None:
+                return None
+            if bound > portal:
+                return bound
+            return portal
+        return combined
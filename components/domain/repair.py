@@ -0,0 +1,135 @@
+from heapq import heappush, heappop, heapify
+
+class Repair:
+    # an a* search tree kept from one path request to the next while they leave from the same start
+    # with a consistent heuristic every closed cell already has its cheapest cost, whichever goal the
+    # heuristic was for, so when the goal moves only the open cells are re-keyed for the new goal and
+    # the search carries on from them, a goal inside the tree is answered without expanding anything
+    def __init__(self, pathfinder, start, version):
+        self.pathfinder = pathfinder
+        self.grid = pathfinder.grid
+        # the root of the tree, and the path cache version it was grown at
+        self.start = start
+        self.version = version
+        # a scratch from the pathfinder's pool, kept for as long as the tree is and given back by close
+        self.scratch = pathfinder.acquire()
+        self.generation = self.scratch.begin()
+        scratch = self.scratch
+        scratch.seen[start], scratch.cost[start], scratch.parent[start], scratch.teleported[start] = self.generation, 0, -1, 0
+        # binary heap of (estimated total cost, tie breaker, cell) for the goals the tree was last grown towards
+        self.frontier = [(0, 0, start)]
+        self.counter = 0
+        # open cells the last heuristic showed can't reach its goals, they may reach the next ones
+        self.parked = []
+        self.goals = None
+        # true while a search is running on the tree, a second request at the same time can't share it
+        self.busy = False
+        # true once the tree is replaced, its scratch goes back to the pool when no search is using it
+        self.closed = False
+
+    def fits(self, pathfinder, start, version):
+        # whether this tree can answer a request from start over the map as it is now
+        return self.pathfinder is pathfinder and self.start == start and self.version == version and not self.busy
+
+    def close(self):
+        # the tree is no longer wanted, give its scratch back now or when the search running on it ends
+        self.closed = True
+        if not self.busy:
+            self.pathfinder.release(self.scratch)
+
+    def retarget(self, goals):
+        # re-key the open cells for a new list of goal indexes, returns the heuristic for them
+        closed, cost = self.scratch.closed, self.scratch.cost
+        heuristic = self.pathfinder.heuristic(goals, start=self.start)
+        if goals == self.goals:
+            # the same goals as last time, the frontier is already keyed for them
+            return heuristic
+        cells = [cell for _, _, cell in self.frontier if closed[cell] != self.generation] + self.parked
+        self.frontier, self.parked = [], []
+        # stale heap entries leave a cell in the list more than once
+        for cell in dict.fromkeys(cells):
+            estimate = heuristic(cell)
+            if estimate == None:
+                self.parked.append(cell)
+            else:
+                self.counter += 1
+                self.frontier.append((cost[cell] + estimate, self.counter, cell))
+        heapify(self.frontier)
+        self.goals = goals
+        return heuristic
+
+    def solve(self, goals):
+        # the same generator protocol and result as Pathfinder.solve, growing the kept tree as needed
+        grid, pathfinder = self.grid, self.pathfinder
+        goals = [index for index in goals if grid.reachable(self.start, index)]
+        if len(goals) == 0:
+            return None, None
+        self.busy = True
+        try:
+            goal = yield from self.search(goals)
+            if goal == None:
+                return None, None
+            return pathfinder.build_path(self.start, goal, self.scratch), goal
+        finally:
+            self.busy = False
+            if self.closed:
+                # replaced while this search ran, the scratch goes back once the path is read from it
+                pathfinder.release(self.scratch)
+
+    def search(self, goals):
+        # a* from where the tree left off, returns the goal reached or None
+        cell_edges, teleports = self.grid.edges, self.grid.teleports
+        scratch, generation = self.scratch, self.generation
+        parent, cost, seen, closed, teleported = scratch.parent, scratch.cost, scratch.seen, scratch.closed, scratch.teleported
+        heuristic = self.retarget(goals)
+        goal_set = set(goals)
+        # the cheapest goal already in the tree, its cost is final so the search only goes on while a
+        # cheaper one could still be found
+        goal = None
+        for index in goals:
+            if closed[index] == generation and (goal == None or cost[index] < cost[goal]):
+                goal = index
+        if goal != None and len(goals) == 1:
+            return goal
+        frontier = self.frontier
+        expanded = 0
+        while len(frontier) > 0:
+            if goal != None and frontier[0][0] >= cost[goal]:
+                break
+            if expanded == self.pathfinder.slice_nodes:
+                # yield before the next cell is taken, so a search that is never resumed leaves the tree whole
+                yield expanded
+                expanded = 0
+            current = heappop(frontier)[2]
+            if closed[current] == generation:
+                continue
+            closed[current] = generation
+            expanded += 1
+            current_cost = cost[current]
+            edges = cell_edges[current]
+            if current in teleports:
+                edges = edges + ((teleports[current] - current, 0),)
+            for offset, step_cost in edges:
+                new_position = current + offset
+                if closed[new_position] == generation:
+                    continue
+                new_cost = current_cost + step_cost
+                if seen[new_position] != generation or new_cost < cost[new_position]:
+                    seen[new_position] = generation
+                    cost[new_position] = new_cost
+                    parent[new_position] = current
+                    teleported[new_position] = step_cost == 0
+                    estimate = heuristic(new_position)
+                    if estimate == None:
+                        # kept for later goals instead of dropped
+                        self.parked.append(new_position)
+                    else:
+                        self.counter += 1
+                        heappush(frontier, (new_cost + estimate, self.counter, new_position))
+            # the goal test comes after the cell's neighbours are in the frontier so the tree stays whole
+            # and the first goal taken is the nearest, it's cheaper than any goal already in the tree
+            if current in goal_set:
+                goal = current
+                break
+        yield expanded
+        return goal
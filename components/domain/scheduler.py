@@ -0,0 +1,39 @@
+from time import perf_counter
+from concurrent.futures import Future
+
+class Scheduler:
+    # works through pending path requests a slice at a time under a per-frame budget, so one expensive
+    # search is spread over several frames instead of stalling the frame it was requested in
+    def __init__(self, node_budget=2000, time_budget=None):
+        # cells that may be expanded per frame
+        self.node_budget = node_budget
+        # seconds that may be spent per frame, None for no time limit
+        self.time_budget = time_budget
+        # (future, job) pairs in request order, a job is a solving generator from the Solver
+        self.pending = []
+
+    def submit(self, job):
+        # queue a solving generator, returns a Future that is done once the job has run to the end
+        future = Future()
+        self.pending.append((future, job))
+        return future
+
+    def run(self):
+        # run pending jobs in request order until they are all done or this frame's budget is spent
+        nodes = 0
+        started = perf_counter()
+        while len(self.pending) > 0:
+            if nodes >= self.node_budget:
+                break
+            if self.time_budget != None and perf_counter() - started >= self.time_budget:
+                break
+            future, job = self.pending[0]
+            if future.cancelled():
+                # the requester no longer wants the result
+                self.pending.pop(0)
+                continue
+            try:
+                nodes += next(job)
+            except StopIteration as stop:
+                self.pending.pop(0)
+                future.set_result(stop.value)
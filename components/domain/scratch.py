@@ -0,0 +1,33 @@
+from array import array
+
+class Scratch:
+    # per-cell working arrays for one search, sized to the map and reused by search after search
+    # instead of clearing them, each search takes a new generation number and a cell only counts as
+    # seen or closed in this search when its stamp equals that number
+    # largest generation before the stamps wrap around and have to be cleared
+    last_generation = 0xffffffff
+
+    def __init__(self, size):
+        # cell the best known path to a cell came from
+        self.parent = array('i', [-1]) * size
+        # cost of the best known path to a cell
+        self.cost = array('i', [0]) * size
+        # generation a cell was last reached in, its parent and cost are only valid when this matches
+        self.seen = array('I', [0]) * size
+        # generation a cell was last expanded in, its cost is final when this matches
+        self.closed = array('I', [0]) * size
+        # 1 where the best known path to a cell ends with a teleport
+        self.teleported = bytearray(size)
+        # a search's own per-cell value, jump point search keeps the direction of the jump here
+        self.direction = bytearray(size)
+        self.generation = 0
+
+    def begin(self):
+        # start a new search, every cell is unseen again, returns the new generation
+        if self.generation == self.last_generation:
+            size = len(self.seen)
+            self.seen = array('I', [0]) * size
+            self.closed = array('I', [0]) * size
+            self.generation = 0
+        self.generation += 1
+        return self.generation
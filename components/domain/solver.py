@@ -1,3 +1,13 @@
+from .grid import Grid
+from .pathfinder import Pathfinder
+from .hierarchy import Hierarchy
+from .workers import chain
+from .pathcache import PathCache
+from .repair import Repair
+from .wavefront import Wavefront
+from .flowfield import FlowField
+from concurrent.futures import Future
+
 class Coordinate:
     # coordinate container for find_path() when only one destination is needed
     def __init__(self, position):
@@ -5,28 +15,109 @@ class Coordinate:
 
 class Solver:
     # this class is where various problem solving methods go
-    # neighbours are for find_path, the tuple indexes map like this:
-    # 0 1 2
-    # 3 4 5
-    # 6 7 8
-    # indexes are delta x and y coordinates around 4 which is the centre point
-    neighbours = ((-1, -1), (0, -1), (1, -1),
-                  (-1,  0), (0,  0), (1,  0),
-                  (-1,  1), (0,  1), (1,  1))
 
     def __init__(self, domain):
         from components.bundled.pytmx import TiledMap
         from components.bundled.pyscroll.orthographic import BufferedRenderer
         # which domain manager the solver is attached to
         self.domain_manager = domain
-        # the map object of that domain
-        self.map_object:TiledMap = domain.map_object
+        # the map object of that domain, filled in by load_map
+        self.map_object:TiledMap = None
         # and its renderer
         self.renderer:BufferedRenderer = domain.renderer
         # the rect for the domain graphical area
         self.surface_rect = domain.surface_rect
         # the gid for which tile is a floor tile
         self.floor_gid = domain.floor_gid
+        # walkability and moves tables for the map, filled in by load_map
+        self.grid:Grid = None
+        # searches over the grid, filled in by load_map
+        self.pathfinder:Pathfinder = None
+        # search strategy of the pathfinder, one of Pathfinder.strategies
+        self.strategy = 'astar'
+        # numpy distance fields over the grid, made on first use since numpy is optional
+        self.wavefront:Wavefront = None
+        # recently solved paths, invalidated when the map is reloaded or the teleporters change
+        self.cache = PathCache()
+        # a teleporter change rebuilds the tables that hold the teleporters and invalidates the cache
+        domain.object_manager.watch('teleporters', lambda event, item: self.change_teleporters())
+        # search tree kept by retarget_path for the next request from the same start
+        self.repair:Repair = None
+        self.load_map()
+
+    def load_map(self):
+        # build the grid tables for the domain map, they must be rebuilt whenever the map is reloaded
+        self.map_object = self.domain_manager.map_object
+        self.floor_gid = self.domain_manager.floor_gid
+        # teleporter source and destination cell coordinates
+        teleporters = [(item.coord, item.destination) for item in self.domain_manager.object_manager.objects('teleporters')]
+        self.grid = Grid(self.map_object, self.floor_gid, self.domain_manager.floor_tiles, teleporters, self.tile_costs())
+        self.pathfinder = Pathfinder(self.grid, strategy=self.strategy)
+        # paths solved over the old map no longer apply
+        self.cache.invalidate()
+
+    def change_teleporters(self):
+        # rebuild what depends on the teleporters, the teleporter tables and region labels of the grid and
+        # the links of the hierarchy on the floors whose teleporters changed, the rest of the grid and the
+        # hierarchy's fields are shared with the old ones
+        # the landmark tables would take a flood of the whole map per landmark to rebuild, so searches go
+        # without them until the next load_map, the portal bound alone is still admissible
+        if self.grid == None or self.domain_manager.map_object is not self.map_object:
+            self.load_map()
+            return
+        teleporters = [(item.coord, item.destination) for item in self.domain_manager.object_manager.objects('teleporters')]
+        self.grid = self.grid.with_teleporters(teleporters)
+        # a new pathfinder, so worker snapshots and kept search trees over the old teleporters are replaced
+        self.pathfinder = Pathfinder(self.grid, Hierarchy(self.grid, self.pathfinder.hierarchy), self.strategy)
+        # paths solved over the old teleporters no longer apply
+        self.cache.invalidate()
+
+    def tile_costs(self):
+        # key:value -> gid:traversal cost, from the 'cost' property of the map's tiles
+        costs = {}
+        for gid, properties in self.map_object.tile_properties.items():
+            if 'cost' in properties:
+                costs[gid] = int(properties['cost'])
+        return costs
+
+    def walkable(self, position):
+        # whether a cell coordinate is inside the map and can be walked on
+        grid = self.get_grid()
+        x, y = position
+        if x < 0 or y < 0 or x >= grid.width or y >= grid.height:
+            return False
+        return grid.walkable[grid.index(position)] == 1
+
+    def set_strategy(self, strategy):
+        # choose the search strategy, 'astar' or 'jps', both find paths of the same cost
+        self.pathfinder = Pathfinder(self.grid, self.pathfinder.hierarchy, strategy, self.pathfinder.landmarks)
+        self.strategy = strategy
+
+    def get_grid(self):
+        # return the grid, rebuilding it first if the map was reloaded since it was built
+        if self.domain_manager.map_object is not self.map_object:
+            self.load_map()
+        return self.grid
+
+    def region(self, position):
+        # region label of a cell coordinate, -1 for walls, cells can only reach cells with the same label
+        grid = self.get_grid()
+        return grid.regions[grid.index(position)]
+
+    def distances(self, positions, towards=True, limit=None):
+        # cost between every cell and the nearest of a list of cell coordinates, as a numpy (height, width)
+        # array indexed [y, x] with Wavefront.unreached where there is no path, needs numpy
+        # towards is the cost from each cell to the positions, otherwise from the positions out to each cell
+        # limit is a move cost, 10 for each straight step, past which cells are left unreached
+        grid = self.get_grid()
+        if self.wavefront == None or self.wavefront.grid is not grid:
+            self.wavefront = Wavefront(grid)
+        return self.wavefront.distances([grid.index(position) for position in positions], towards, limit)
+
+    def within(self, position, limit):
+        # cell coordinates that can be reached from a cell coordinate for at most limit move cost, needs numpy
+        rows, columns = (self.distances([position], False, limit) != Wavefront.unreached).nonzero()
+        return [(int(x), int(y)) for y, x in zip(rows, columns)]
 
     def pixel_to_cell(self, x, y):
         # convert a pixel coordinate within the drawing area to a cell coordinate for indexing
@@ -51,96 +142,130 @@ class Solver:
         return x_coord, y_coord
 
     def find_path(self, start_position, destinations):
-        # solve a path from a start to multiple destinations and return shortest
-        frontier = [start_position]
-        came_from = {}
-        came_from[start_position] = goal = goal_object = None
-        teleport_destinations = {}
-        used_teleporters = []
-        found = False
-        while len(frontier) > 0:
-            # get the frontier cell coordinate
-            current = frontier.pop(0)
-            # compare that coordinate against all destination objects
-            for item in destinations:
-                if item.coord == current:
-                    # destination object is found
-                    found = True
-                    goal = current
-                    goal_object = item
-                    # break for loop
-                    break
-            if found:
-                # if found, also break while loop
-                break
-            # check if there is a teleporter at the current cell
-            teleporter = self.domain_manager.teleporters(current)
-            if teleporter != None:
-                # get source and destination cell coordinates
-                source, destination = teleporter.coord, teleporter.destination
-                if source not in used_teleporters:
-                    # add them to used, only allowed to use a teleporter pair once
-                    used_teleporters.append(source)
-                    used_teleporters.append(destination)
-                    if destination not in frontier:
-                        # add the teleporter destination cell to the frontier
-                        frontier.append(destination)
-                        came_from[destination] = current
-                        # track teleport coordinate for the path
-                        teleport_destinations[destination] = destination
-            # create list of valid neighbours from the current cell
-            adjacents = []
-            # fill list with cell positions by adding neighbour deltas to each axis
-            for neighbour in self.neighbours:
-                adjacents.append(self.domain_manager.cell_gid((current[0] + neighbour[0], current[1] + neighbour[1])))
-            # block out invalid moves depending on present floor tiles
-            if adjacents[1] != self.floor_gid:
-                adjacents[0] = None
-                adjacents[2] = None
-            if adjacents[5] != self.floor_gid:
-                adjacents[2] = None
-                adjacents[8] = None
-            if adjacents[7] != self.floor_gid:
-                adjacents[6] = None
-                adjacents[8] = None
-            if adjacents[3] != self.floor_gid:
-                adjacents[0] = None
-                adjacents[6] = None
-            # add neighbours that are floor tiles to the frontier, the order affects how straight the paths are
-            for index in (1, 5, 7, 3, 2, 8, 6, 0):
-                # if it is a floor tile
-                if adjacents[index] == self.domain_manager.floor_gid:
-                    new_position = current[0] + self.neighbours[index][0], current[1] + self.neighbours[index][1]
-                    # if the neighbour is on the same floor then it is valid
-                    if self.domain_manager.get_floor(current) == self.domain_manager.get_floor(new_position):
-                        # if the cell hasn't been previously visited then add it to the frontier
-                        if new_position not in came_from:
-                            frontier.append(new_position)
-                            # track the flow of the cell
-                            came_from[new_position] = current
-        if found:
-            # path between goal and start
-            path = []
-            # is there a teleporter at the goal?
-            teleporter = self.domain_manager.teleporters(goal)
-            if teleporter != None:
-                # if so, add that teleport to the path
-                destination = teleporter.destination
-                path.append(('teleport', destination))
-            # get a list of the tracked teleport coordinates
-            teleports = teleport_destinations.keys()
-            # follow the flow back to the start
-            while goal != start_position:
-                # is this cell a teleport?
-                if goal in teleports:
-                    path.append(('teleport', teleport_destinations[goal]))
-                # otherwise it's a move
-                else:
-                    path.append(('move', goal))
-                # follow flow
-                goal = came_from[goal]
-            # path is in reverse order, goal to start
-            return path, goal_object
+        # solve a path from a start to multiple destinations and return the nearest by path cost
+        return self.pathfinder.complete(self.solve_path(start_position, destinations))
+
+    def cached_path(self, start_position, destinations):
+        # the (path, goal object) result of find_path if it is in the cache, otherwise None
+        grid = self.get_grid()
+        goals = self.goal_index(destinations)
+        cached = self.cache.get(self.cache.key(grid.index(start_position), goals.keys()))
+        if cached == None:
+            return None
+        return cached[0], self.goal_object(cached[1], goals)
+
+    def solve_path(self, start_position, destinations):
+        # find_path as a generator, it yields the number of cells expanded every slice_nodes cells
+        # so a scheduler can spread one search over several frames, and it returns (path, goal object)
+        grid = self.get_grid()
+        goals = self.goal_index(destinations)
+        start, indexes = grid.index(start_position), list(goals.keys())
+        key = self.cache.key(start, indexes)
+        cached = self.cache.get(key)
+        if cached != None:
+            path, goal = cached
         else:
-            # no valid path found
-            return None, None
+            version = self.cache.version
+            path, goal = yield from self.pathfinder.solve(start, indexes)
+            self.cache.put(key, path, goal, version)
+        return path, self.goal_object(goal, goals)
+
+    def find_paths(self, requests):
+        # find_path for a list of (start, destinations) requests at once, results in request order
+        return self.pathfinder.complete(self.solve_paths(requests))
+
+    def solve_paths(self, requests):
+        # find_paths as a generator, yields like solve_path and returns a list of (path, goal object)
+        # requests with the same set of goal cells are answered together, a group of one is searched for
+        # like solve_path and a larger group reads every start's path off one FlowField flooded from the goals
+        grid = self.get_grid()
+        results = [None] * len(requests)
+        # key:value -> frozenset of goal indexes:list_of (request number, start position, goals, cache key)
+        groups = {}
+        for number, (start_position, destinations) in enumerate(requests):
+            goals = self.goal_index(destinations)
+            key = self.cache.key(grid.index(start_position), goals.keys())
+            cached = self.cache.get(key)
+            if cached != None:
+                results[number] = cached[0], self.goal_object(cached[1], goals)
+            else:
+                groups.setdefault(key[1], []).append((number, start_position, goals, key))
+        version = self.cache.version
+        for indexes, members in groups.items():
+            if len(members) == 1:
+                number, start_position, goals, key = members[0]
+                path, goal = yield from self.pathfinder.solve(key[0], list(indexes))
+                self.cache.put(key, path, goal, version)
+                results[number] = path, self.goal_object(goal, goals)
+                continue
+            # the goal objects of the first request stand for the group, the field answers with the
+            # first object listed on a cell the same as goal_object does
+            field = FlowField(grid, members[0][2].values())
+            for number, start_position, goals, key in members:
+                path, target = field.path(start_position)
+                goal = None if target == None else grid.index(target.coord)
+                self.cache.put(key, path, goal, version)
+                results[number] = path, self.goal_object(goal, goals)
+        return results
+
+    def retarget_path(self, start_position, destinations, missed=False):
+        # solve_path for a requester that keeps asking from the same start while its destinations move
+        # the search tree of the last such request is carried on from when the start is the same
+        # missed is true when the caller has just missed in the cache with cached_path, so the lookup
+        # isn't made and counted a second time
+        grid = self.get_grid()
+        goals = self.goal_index(destinations)
+        start, indexes = grid.index(start_position), list(goals.keys())
+        key = self.cache.key(start, indexes)
+        if not missed:
+            cached = self.cache.get(key)
+            if cached != None:
+                return cached[0], self.goal_object(cached[1], goals)
+        version = self.cache.version
+        if self.repair == None or not self.repair.fits(self.pathfinder, start, version):
+            # a new start, a changed map, or the tree is in use by a request still running
+            if self.repair != None:
+                self.repair.close()
+            self.repair = Repair(self.pathfinder, start, version)
+        path, goal = yield from self.repair.solve(indexes)
+        self.cache.put(key, path, goal, version)
+        return path, self.goal_object(goal, goals)
+
+    def submit_path(self, workers, start_position, destinations, missed=False):
+        # find_path on a Workers pool, returns a Future of the (path, goal object) result
+        # missed is the same as for retarget_path
+        grid = self.get_grid()
+        # only the goal indexes go to the worker
+        goals = self.goal_index(destinations)
+        start, indexes = grid.index(start_position), list(goals.keys())
+        key = self.cache.key(start, indexes)
+        if not missed:
+            cached = self.cache.get(key)
+            if cached != None:
+                # already solved, the future is done straight away
+                future = Future()
+                future.set_result((cached[0], self.goal_object(cached[1], goals)))
+                return future
+        version = self.cache.version
+        def convert(result):
+            # runs on the worker thread, store the result and map the goal index back to its object
+            path, goal = result
+            self.cache.put(key, path, goal, version)
+            return path, self.goal_object(goal, goals)
+        return chain(workers.submit(self.pathfinder, start, indexes), convert)
+
+    def goal_index(self, destinations):
+        # key:value -> flat index:destination object, built once per query, cells with several
+        # destinations keep the first so the search has each goal cell once
+        goals = {}
+        for item in destinations:
+            index = self.grid.index(item.coord)
+            if index not in goals:
+                goals[index] = item
+        return goals
+
+    def goal_object(self, goal, goals):
+        # the destination object for a goal index, the first listed when several share the cell
+        if goal == None:
+            return None
+        return goals[goal]
@@ -0,0 +1,69 @@
+# numpy is optional, pygame is the only required dependency so the wavefront is only there when it is
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class Wavefront:
+    # whole map distance fields computed a sweep at a time with numpy instead of a cell at a time
+    # each sweep lowers every cell to its cheapest neighbour plus the move cost, for all eight directions
+    # at once as shifted slices of the distance array, masked by the moves table so the floor edges and
+    # the no corner cutting rule hold, then takes the teleporter hops, and repeats until nothing changes
+    # distance of a cell that can't be reached
+    unreached = 0x7fffffff
+
+    def __init__(self, grid):
+        if numpy == None:
+            raise Exception('Wavefront: numpy is not installed')
+        self.grid = grid
+        height, width = grid.height, grid.width
+        moves = numpy.frombuffer(bytes(grid.moves), dtype=numpy.uint8).reshape(height, width)
+        cell_costs = numpy.frombuffer(bytes(grid.cell_costs), dtype=numpy.uint8).reshape(height, width).astype(numpy.int64)
+        # per direction (cells slice, neighbours slice, legal mask over the cells slice, move costs over the
+        # cells slice), a move costs the direction's cost scaled by the average of the two cells' costs
+        self.sweeps = []
+        for bit, (dx, dy, cost) in enumerate(grid.directions):
+            rows = slice(max(0, -dy), height - max(0, dy))
+            columns = slice(max(0, -dx), width - max(0, dx))
+            neighbour_rows = slice(max(0, dy), height + min(0, dy))
+            neighbour_columns = slice(max(0, dx), width + min(0, dx))
+            legal = (moves[rows, columns] & (1 << bit)) != 0
+            costs = (cost * (cell_costs[rows, columns] + cell_costs[neighbour_rows, neighbour_columns])) >> 1
+            self.sweeps.append(((rows, columns), (neighbour_rows, neighbour_columns), legal, costs))
+        # teleporter source and destination indexes, in matching order
+        self.sources = numpy.array(list(grid.teleports.keys()), dtype=numpy.intp)
+        self.destinations = numpy.array(list(grid.teleports.values()), dtype=numpy.intp)
+
+    def distances(self, cells, towards=True, limit=None):
+        # cost between every cell and the nearest of a list of cell indexes, as a (height, width) int32 array
+        # towards is the cost from each cell to the cells, otherwise the cost from the cells to each cell,
+        # they only differ in the direction teleporters are taken since moves are symmetric
+        # past limit, when given, cells are left unreached and the sweeps stop early
+        grid = self.grid
+        unreached = self.unreached
+        # int64 so unreached plus a move cost can't overflow
+        field = numpy.full((grid.height, grid.width), unreached, dtype=numpy.int64)
+        flat = field.reshape(-1)
+        flat[numpy.array(cells, dtype=numpy.intp)] = 0
+        while True:
+            before = field.copy()
+            for cells_slice, neighbours_slice, legal, costs in self.sweeps:
+                # updated in place so a sweep carries on from the directions before it
+                view = field[cells_slice]
+                numpy.minimum(view, numpy.where(legal, field[neighbours_slice] + costs, unreached), out=view)
+            if len(self.sources) > 0:
+                # teleporters cost nothing, a source is as near as its destination when going towards the cells
+                # and a destination is as near as its source when going out from them
+                if towards:
+                    numpy.minimum.at(flat, self.sources, flat[self.destinations])
+                else:
+                    numpy.minimum.at(flat, self.destinations, flat[self.sources])
+            changed = field < before
+            if not changed.any():
+                break
+            if limit != None and field[changed].min() > limit:
+                # everything still changing is already past the limit
+                break
+        if limit != None:
+            field[field > limit] = unreached
+        return field.astype(numpy.int32)
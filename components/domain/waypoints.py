@@ -0,0 +1,39 @@
+from array import array
+
+class Waypoints:
+    # a solved path kept as only the cells where it turns, teleports, or ends, in forward order
+    # a straight or diagonal run of moves is one waypoint at its far end, since moving to that cell
+    # centre in a straight line passes through the centres of every cell along the run
+    # stored flat in an array of (kind, x, y) shorts, kind is 0 for a move and 1 for a teleport
+    # it isn't changed after it's made, so one can be cached and shared by any number of followers
+    kinds = ('move', 'teleport')
+
+    def __init__(self, start, steps):
+        # start is the cell coordinate the path leaves from, steps are ('move' or 'teleport', cell) in forward order
+        self.values = array('h')
+        previous = start
+        # direction of the run the last move waypoint ended, None after a teleport or at the start
+        run = None
+        for kind, position in steps:
+            if kind == 'teleport':
+                self.values.extend((1, position[0], position[1]))
+                run = None
+            else:
+                direction = (position[0] - previous[0], position[1] - previous[1])
+                if direction == run:
+                    # the same direction as the last move, carry that waypoint on to this cell
+                    self.values[-2], self.values[-1] = position
+                else:
+                    self.values.extend((0, position[0], position[1]))
+                    run = direction
+            previous = position
+
+    def __len__(self):
+        # number of waypoints
+        return len(self.values) // 3
+
+    def __iter__(self):
+        # ('move' or 'teleport', cell coordinate) for each waypoint in forward order
+        values = self.values
+        for index in range(0, len(values), 3):
+            yield self.kinds[values[index]], (values[index + 1], values[index + 2])
@@ -0,0 +1,79 @@
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+
+# the pathfinder snapshot of a worker process, set once per process by the pool initializer
+snapshot = None
+
+def set_snapshot(pathfinder):
+    # process pool initializer
+    global snapshot
+    snapshot = pathfinder
+
+def find_snapshot(start, goals):
+    # run a search on the worker process snapshot
+    return snapshot.find(start, goals)
+
+def find_with(pathfinder, start, goals):
+    # run a search on a snapshot shared with a worker thread
+    return pathfinder.find(start, goals)
+
+class Workers:
+    # a pool of worker threads or processes that run path searches off the main loop
+    # workers are only given a frozen Pathfinder snapshot and flat indexes, never pygame or pytmx objects
+    def __init__(self, kind='process', count=None):
+        # 'thread' or 'process', processes search in parallel with the main loop on multi-core machines
+        if kind not in ('thread', 'process'):
+            raise Exception(f'Workers: {kind} not recognized')
+        self.kind = kind
+        # number of workers, None for the pool default
+        self.count = count
+        # the pathfinder the current snapshot and pool were made from
+        self.source = None
+        self.snapshot = None
+        self.pool = None
+
+    def submit(self, pathfinder, start, goals):
+        # search from a start index to the nearest of a list of goal indexes on a worker
+        # returns a Future of the (path, goal index) result
+        if pathfinder is not self.source:
+            # first submit, or the map was reloaded, so take a new snapshot and start a new pool for it
+            self.shutdown()
+            self.source = pathfinder
+            self.snapshot = pathfinder.snapshot()
+        if self.pool == None:
+            if self.kind == 'process':
+                # processes are sent the snapshot once, when they start
+                self.pool = ProcessPoolExecutor(self.count, initializer=set_snapshot, initargs=(self.snapshot,))
+            else:
+                self.pool = ThreadPoolExecutor(self.count)
+        if self.kind == 'process':
+            return self.pool.submit(find_snapshot, start, goals)
+        else:
+            return self.pool.submit(find_with, self.snapshot, start, goals)
+
+    def shutdown(self):
+        # stop the pool, pending searches are cancelled
+        if self.pool != None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+def chain(future, convert):
+    # return a Future of convert applied to the result of another Future, convert runs on whichever
+    # thread finishes the first future so it must not touch pygame
+    result = Future()
+    def done(inner):
+        if inner.cancelled():
+            result.cancel()
+        elif not result.set_running_or_notify_cancel():
+            # the requester cancelled it first, and once it's running the main loop can't cancel it
+            # between here and the result being set
+            return
+        elif inner.exception() != None:
+            result.set_exception(inner.exception())
+        else:
+            result.set_result(convert(inner.result()))
+    def cancelled(outer):
+        if outer.cancelled():
+            future.cancel()
+    result.add_done_callback(cancelled)
+    future.add_done_callback(done)
+    return result
@@ -16,21 +16,23 @@ class Agent(DomainObject):
     def process(self):
         if self.destination_object == None:
             if len(self.object_manager.objects('generic')) > 0:
-                # find the nearest item
-                path, self.destination_object = self.domain_manager.find_path(
-                    self.coord, self.object_manager.objects('generic'))
+                # find the nearest item from the shared generic flow field
+                path, self.destination_object = self.domain_manager.nearest(self.coord, 'generic')
                 if path != None:
                     self.object_manager.object_remove('generic', self.destination_object)
                     self.command(Path(path))
         else:
             # remove reference to old object
             self.object_manager.delete('generic', self.destination_object)
-            # create a new generic object
+            # create a new generic object somewhere agents in this region can reach
             position = self.domain_manager.random_position(self.floor_gid, 0, 0,
-                                                           self.map_object.width, self.map_object.height)
-            item_object = Generic(position)
-            item_object.layer = 1
-            # track the generic item
-            self.object_manager.object_add('generic', item_object)
+                                                           self.map_object.width, self.map_object.height,
+                                                           self.domain_manager.region(self.coord))
+            # unless the region has no free cell left
+            if position != None:
+                item_object = Generic(position)
+                item_object.layer = 1
+                # track the generic item
+                self.object_manager.object_add('generic', item_object)
             # reset destination to none
             self.destination_object = None
@@ -1,4 +1,4 @@
-from .domainobject import DomainObject, Path
+from .domainobject import DomainObject, Pending, Move_To
 from components.domain.solver import Coordinate
 
 class Avatar(DomainObject):
@@ -19,7 +19,7 @@ class Avatar(DomainObject):
     def process(self):
         if self.inventory == None:
             # check current cell for a pickup object
-            pickups = self.domain_manager.cell_objects(self.coord, self.object_manager.objects('pickups'))
+            pickups = self.domain_manager.cell_objects(self.coord, 'pickups')
             if len(pickups) > 0:
                 # enable pick up button
                 self.gui_manager.switch_context('pickup_context')
@@ -31,31 +31,45 @@ class Avatar(DomainObject):
                 self.gui_manager.switch_context('putdown_context')
 
     def move_to(self, position):
-        if self.domain_manager.cell_gid(position) == self.floor_gid:
+        if self.domain_manager.walkable(position):
             # perform move
             destination = self.reset_queue()
+            # clicks made while moving keep asking from the same cell, so each one repairs the last search
             if destination == None:
                 # there is no move to in the queue, pathfind from current coordinate
-                path = self.domain_manager.find_path(self.coord, [Coordinate(position)])[0]
+                request = self.domain_manager.retarget_path(self.coord, [Coordinate(position)])
             else:
                 # there is a move to, pathfind from its destination after it completes
-                path = self.domain_manager.find_path(destination, [Coordinate(position)])[0]
-            if path != None:
-                # switch to default context while moving
-                self.gui_manager.switch_context('default')
-                # add path to the command queue
-                self.command(Path(path))
+                request = self.domain_manager.retarget_path(destination, [Coordinate(position)])
+            # wait on the path request, the path is added to the command queue when it is done
+            self.command(Pending(request))
+
+    def path_start(self):
+        # the cell move_to would pathfind from, without changing the queue
+        if len(self.command_queue) > 0 and self.command_name(self.command_queue[0]) == 'Move_To':
+            return self.next_cell(self.command_queue[0].destination)
+        return self.coord
+
+    def path_found(self, path, goal_object):
+        if path != None:
+            # switch to default context while moving
+            self.gui_manager.switch_context('default')
+        super().path_found(path, goal_object)
 
     def reset_queue(self):
         # clear the queue except for the first in-progress move to
+        for command in self.command_queue:
+            if self.command_name(command) == 'Pending':
+                # a path request that hasn't finished yet is no longer wanted
+                command.request.cancel()
         if len(self.command_queue) > 0:
             # get the current command
             current = self.command_queue[0]
             if self.command_name(current) == 'Move_To':
-                # if it's a move to return its destination in cell coordinates and clear the queue except for it
-                destination = current.destination
-                coord = int(destination[0] / self.map_object.tilewidth), int(destination[1] / self.map_object.tileheight)
-                self.command_queue = [current]
+                # a move to may run along many cells to the next waypoint, so it's cut short at the next
+                # cell centre on the way, then the queue is cleared except for it and that cell is returned
+                coord = self.next_cell(current.destination)
+                self.command_queue = [Move_To(self.pixel_centre(coord))]
                 return coord
         # otherwise clear the entire queue and return None
         self.command_queue = []
@@ -63,7 +77,7 @@ class Avatar(DomainObject):
 
     def pick_up(self):
         # pick up inventory
-        pickup = self.domain_manager.cell_objects(self.coord, self.object_manager.objects('pickups'))[0]
+        pickup = self.domain_manager.cell_objects(self.coord, 'pickups')[0]
         self.inventory = pickup
         # delete pickup object from the domain
         self.object_manager.delete('pickups', pickup)
@@ -24,6 +24,8 @@ Stall = namedtuple('Stall', 'none')
 Move_To = namedtuple('Move_To', 'destination')
 Teleport = namedtuple('Teleport', 'destination')
 Path = namedtuple('Path', 'path')
+Follow = namedtuple('Follow', 'waypoints')
+Pending = namedtuple('Pending', 'request')
 
 # all domain objects are subclasses of Sprite
 from pygame.sprite import Sprite
@@ -49,6 +51,8 @@ class DomainObject(Sprite):
         # values updated by either sync_coordinate or sync_cell
         self.centre_xpos = self.centre_ypos = None
         self.coord = None
+        # centre position at the start of the last update, to draw the object between simulation ticks
+        self.previous_xpos = self.previous_ypos = None
         # filled in by load_tiles
         self.rect = None
         # world pixels per second
@@ -70,6 +74,8 @@ class DomainObject(Sprite):
         # subclasess must call either sync_coordinate or sync_cell before they exit their __init__
 
     def update(self, elapsed_time):
+        # remember where this tick starts from
+        self.previous_xpos, self.previous_ypos = self.centre_xpos, self.centre_ypos
         # update animation frame
         self.update_image(elapsed_time)
         # check the command queue for any commands
@@ -101,16 +107,32 @@ class DomainObject(Sprite):
                 # if follow then switch floor
                 if self.follow:
                     self.domain_manager.switch_floor(self.domain_manager.get_floor(destination))
+            elif command_name == 'Pending':
+                # waiting on a path request, like stall until the request is done and then it removes itself
+                request = command.request
+                if request.cancelled():
+                    # nobody solves a cancelled request, it counts as no path
+                    self.command_queue.pop(0)
+                    self.path_found(None, None)
+                elif request.done():
+                    self.command_queue.pop(0)
+                    path, goal_object = request.result()
+                    self.path_found(path, goal_object)
             elif command_name == 'Path':
-                # insert a path into the command queue
-                path = command.path
-                # remove this command from the queue
-                self.command_queue.pop(0)
-                # replaces a path_to with move_to and teleport commands without affecting items in the queue after it
-                # path is in reverse order, when inserted into the queue that results in the commands being in forward order
-                for kind, value in path:
+                # start following a path, the path is Waypoints which may be shared so it isn't changed,
+                # instead the path is replaced by a follow command with its own place in the waypoints
+                self.command_queue[0] = Follow(iter(command.path))
+            elif command_name == 'Follow':
+                # put the next waypoint in front of the follow command, so only one move to or teleport
+                # is queued at a time however long the path is
+                waypoint = next(command.waypoints, None)
+                if waypoint == None:
+                    # all the waypoints have been reached
+                    self.command_queue.pop(0)
+                else:
+                    kind, value = waypoint
                     if kind == 'move':
-                        # convert to renderer map rect pixel coordinates for each position in the path
+                        # convert to renderer map rect pixel coordinates
                         self.command_queue.insert(0, Move_To(self.pixel_centre(value)))
                     elif kind == 'teleport':
                         self.command_queue.insert(0, Teleport(value))
@@ -128,10 +150,28 @@ class DomainObject(Sprite):
         # add a command to the command queue
         self.command_queue.append(command)
 
+    def path_found(self, path, goal_object):
+        # a pending path request is done, follow the path next, override in subclass to do more with it
+        if path != None:
+            self.command_queue.insert(0, Path(path))
+
     def command_name(self, command):
         # return the name of the tuple which is the command
         return type(command).__name__
 
+    def next_cell(self, destination):
+        # the cell whose centre is next on a straight or diagonal move to destination in renderer map rect pixels
+        # which is the current cell until its centre is passed, then the cell after it
+        target = int(destination[0] / self.map_object.tilewidth), int(destination[1] / self.map_object.tileheight)
+        # step towards the destination cell on each axis, -1, 0, or 1
+        step_x = (target[0] > self.coord[0]) - (target[0] < self.coord[0])
+        step_y = (target[1] > self.coord[1]) - (target[1] < self.coord[1])
+        centre_x, centre_y = self.pixel_centre(self.coord)
+        if ((self.centre_xpos - centre_x) * step_x) + ((self.centre_ypos - centre_y) * step_y) > 0:
+            # already past the centre of the current cell
+            return self.coord[0] + step_x, self.coord[1] + step_y
+        return self.coord
+
     def distance_from(self, position):
         # distance between self and position
         return sqrt((abs(self.centre_xpos - position[0]) ** 2) + (abs(self.centre_ypos - position[1]) ** 2))
@@ -153,13 +193,30 @@ class DomainObject(Sprite):
         # update position state in pixels
         self.centre_xpos, self.centre_ypos = position
         self.rect.center = int(self.centre_xpos), int(self.centre_ypos)
+        previous = self.coord
         self.coord = int(self.rect.centerx / self.map_object.tilewidth), int(self.rect.centery / self.map_object.tileheight)
+        if self.coord != previous:
+            # keep the object manager's occupancy index up to date, only when the cell actually changes
+            self.object_manager.moved(self, previous)
 
     def sync_cell(self, position):
         # update position state in cells
         self.centre_xpos, self.centre_ypos = self.pixel_centre(position)
         self.rect.center = int(self.centre_xpos), int(self.centre_ypos)
+        # a jump to a cell, like a teleport, isn't drawn as a slide from where the object was
+        self.previous_xpos, self.previous_ypos = self.centre_xpos, self.centre_ypos
+        previous = self.coord
         self.coord = position
+        if self.coord != previous:
+            self.object_manager.moved(self, previous)
+
+    def interpolated(self, alpha):
+        # centre position a fraction alpha of the way from the start of the last tick to now, in
+        # renderer map rect pixels
+        if self.previous_xpos == None:
+            return int(self.centre_xpos), int(self.centre_ypos)
+        return (int(self.previous_xpos + ((self.centre_xpos - self.previous_xpos) * alpha)),
+                int(self.previous_ypos + ((self.centre_ypos - self.previous_ypos) * alpha)))
 
     def load_tiles(self, tiles):
         # load a tile sequence from tile sheet as an animation
@@ -7,18 +7,104 @@ class ObjectManager:
         # main domain group, everything in this group will be drawn onscreen
         # 'domain' is a reserved list name, it is all the objects that will be drawn
         self.item_dict['domain'] = PyscrollGroup(renderer)
+        # watchers are key:value -> list_name:list_of_callbacks, called with ('add' or 'remove', object)
+        # whenever an object is added to or removed from that named list
+        self.watchers = {}
+        # occupancy index, key:value -> list_name:{cell coordinate:{object:None}} for every named list and
+        # the domain group, the objects on a cell are a dict so they keep the order they were added in
+        self.occupancy = {}
+        # key:value -> object:list_of names it is in the occupancy index under
+        self.memberships = {}
+        # callbacks called with (cell coordinate, True) when a cell gets its first object in the domain
+        # group and (cell coordinate, False) when it loses its last one
+        self.cell_watchers = []
 
     def object_add(self, name, object):
         # append and add an object to the named list and the domain group
         if name not in self.item_dict.keys():
             self.item_dict[name] = []
         self.item_dict[name].append(object)
+        self.index_add(name, object)
         self.domain_add(object)
+        self.notify(name, 'add', object)
 
     def object_remove(self, name, object):
         # remove an object from the named list
         if name in self.item_dict.keys():
             self.item_dict[name].remove(object)
+            self.index_remove(name, object)
+            self.notify(name, 'remove', object)
+
+    def index_add(self, name, object):
+        # put an object in the occupancy index of a named list at its cell
+        self.cell_enter(name, object.coord, object)
+        self.memberships.setdefault(object, []).append(name)
+
+    def index_remove(self, name, object):
+        # take an object out of the occupancy index of a named list
+        self.cell_leave(name, object.coord, object)
+        names = self.memberships[object]
+        names.remove(name)
+        if len(names) == 0:
+            del self.memberships[object]
+
+    def moved(self, object, previous):
+        # an object's cell changed from previous, move it in the occupancy index of each list it's in
+        for name in self.memberships.get(object, ()):
+            self.cell_leave(name, previous, object)
+            self.cell_enter(name, object.coord, object)
+
+    def cell_enter(self, name, position, object):
+        # index an object on a cell of a named list
+        cells = self.occupancy.setdefault(name, {})
+        if position not in cells.keys():
+            cells[position] = {}
+            if name == 'domain':
+                for callback in self.cell_watchers:
+                    callback(position, True)
+        cells[position][object] = None
+
+    def cell_leave(self, name, position, object):
+        # take an object off a cell of a named list
+        cells = self.occupancy[name]
+        del cells[position][object]
+        if len(cells[position]) == 0:
+            del cells[position]
+            if name == 'domain':
+                for callback in self.cell_watchers:
+                    callback(position, False)
+
+    def watch_cells(self, callback):
+        # call callback with (cell coordinate, occupied) whenever a cell fills or empties in the domain group
+        self.cell_watchers.append(callback)
+
+    def cell_objects(self, position, name):
+        # return a list of the objects of a named list on a cell coordinate, in the order they were added
+        if name in self.occupancy.keys() and position in self.occupancy[name].keys():
+            return list(self.occupancy[name][position])
+        return []
+
+    def occupied(self, position, name='domain'):
+        # whether any object of a named list, by default the domain group, is on a cell coordinate
+        return name in self.occupancy.keys() and position in self.occupancy[name].keys()
+
+    def cell_count(self, name):
+        # number of different cells the objects of a named list are on
+        if name in self.occupancy.keys():
+            return len(self.occupancy[name])
+        return 0
+
+    def watch(self, name, callback):
+        # call callback whenever the named list gains or loses an object
+        if name not in self.watchers.keys():
+            self.watchers[name] = []
+        self.watchers[name].append(callback)
+
+    def notify(self, name, event, object):
+        # tell the watchers of a named list about a change to it
+        if name in self.watchers.keys():
+            for callback in self.watchers[name]:
+                callback(event, object)
 
     def objects(self, name):
         # return all the objects for a name as a list
@@ -29,12 +115,15 @@ class ObjectManager:
 
     def domain_add(self, object):
         # add an object into the domain group only
-        self.item_dict['domain'].add(object)
+        if object not in self.item_dict['domain']:
+            self.item_dict['domain'].add(object)
+            self.index_add('domain', object)
 
     def domain_remove(self, object):
         # remove an object from the domain group
         if object in self.item_dict['domain']:
             self.item_dict['domain'].remove(object)
+            self.index_remove('domain', object)
 
     def domain(self):
         # return the domain group
@@ -45,5 +134,7 @@ class ObjectManager:
         if name in self.item_dict.keys():
             if object in self.item_dict[name]:
                 self.item_dict[name].remove(object)
+                self.index_remove(name, object)
+                self.notify(name, 'remove', object)
             if object in self.domain():
                 self.domain_remove(object)
@@ -1,5 +1,5 @@
-import time
 import pygame
+from time import perf_counter
 from pygame import Rect
 from components.domain.domainmanager import DomainManager
 from components.object.domainobject import DomainObject
@@ -108,10 +108,20 @@ class Game:
         gameover = False
         # maximum frames-per-second, 0 for unlimited
         fps = 0
+        # the simulation runs in fixed steps of tick seconds whatever the frame rate, so it behaves the
+        # same on every machine, and rendering draws the objects between the last two ticks
+        tick = 1.0 / 60.0
+        # most ticks run in one frame to catch up, past that a slow frame slows the game down
+        # instead of running ever more ticks to catch up
+        max_ticks = 5
         # instantiate a pygame clock for frame maximum limits
         clock = pygame.time.Clock()
-        # track elapsed_time with more accurate os clock
-        previous_time = time.time()
+        # track elapsed time with the high resolution performance counter
+        previous_time = perf_counter()
+        # time passed that hasn't been simulated yet
+        accumulator = 0.0
+        # set by a tick that wins or loses, the gui context is locked after the gui damage is restored
+        won = lost = False
         # continue while the running flag is true
         while self.running:
             # update scroll bar states
@@ -119,19 +129,34 @@ class Game:
             # handle events
             self.handle_events()
             # manage time
-            now_time = time.time()
-            elapsed_time = now_time - previous_time
+            now_time = perf_counter()
+            accumulator += now_time - previous_time
             previous_time = now_time
             if not gameover:
                 # update whether to follow the avatar through teleporters
                 self.domain_manager.avatar.follow = self.follow_avatar
-                # update domain state
-                self.domain_manager.update_domain(elapsed_time)
-                # if follow_avatar centre on avatar, after update_domain to avoid jitter
-                if self.follow_avatar:
-                    self.domain_manager.main_viewport = list(self.domain_manager.avatar.rect.center)
+                # run every whole tick that has passed, up to max_ticks
+                ticks = 0
+                while accumulator >= tick and ticks < max_ticks and not (won or lost):
+                    # update domain state
+                    self.domain_manager.update_domain(tick)
+                    accumulator -= tick
+                    ticks += 1
+                    # check for the end of the game after every tick, so the outcome doesn't depend on frame rate
+                    won = self.domain_manager.check_win()
+                    lost = self.domain_manager.check_loss()
+                if ticks == max_ticks:
+                    # too far behind, drop the whole ticks that are left
+                    accumulator %= tick
+                # work on path requests once this frame, including any made by its ticks
+                self.domain_manager.update_requests()
+            # how far the simulation is between the last tick and the next
+            alpha = min(accumulator / tick, 1.0)
+            if not gameover and self.follow_avatar:
+                # if follow_avatar centre on the avatar where it's drawn, to avoid jitter
+                self.domain_manager.main_viewport = list(self.domain_manager.avatar.interpolated(alpha))
             # draw the main viewport to the viewport surface
-            self.domain_manager.draw_domain()
+            self.domain_manager.draw_domain(alpha)
             # copy domain view surface into the main screen surface
             self.screen.blit(self.view_surface, self.view_surface_rect)
             # draw gui widgets
@@ -153,16 +178,18 @@ class Game:
             self.screen.blit(mouse_bitmap, mouse_rect)
             # restore bitmaps under gui objects
             self.gui_manager.undraw_widgets()
-            # check for winning conditions after gui damage has been filled as the gui context may be changed
+            # act on winning conditions after gui damage has been filled as the gui context may be changed
             if not gameover:
-                # check for game win
-                if self.domain_manager.check_win():
+                # the game was won by a tick this frame
+                if won:
                     self.gui_manager.lock_context('win_context')
                     gameover = True
-                # check for collision with any agent which is a loss
-                if self.domain_manager.check_loss():
+                # a tick this frame had a collision with an agent which is a loss
+                if lost:
                     self.gui_manager.lock_context('lost_context')
                     gameover = True
+        # release domain resources
+        self.domain_manager.close()
         # return from scene
         return
 
@@ -277,6 +304,8 @@ class Game:
         if self.view_surface_rect.collidepoint(x, y):
             # inside the view_surface_rect, get the cell coordinate
             x_coord, y_coord = self.domain_manager.pixel_to_cell(x - self.view_surface_rect.x, y - self.view_surface_rect.y)
+            # preview the avatar's path to the hovered cell, only searched again when the cell or avatar moves
+            self.domain_manager.preview_path((x_coord, y_coord))
             # show relative-to-floor or absolute coordinates
             if self.coordinate_toggle:
                 # these coordinates are relative-to-floor
@@ -287,6 +316,7 @@ class Game:
         else:
             # not inside the surface rect
             self.status = 'N/A'
+            self.domain_manager.preview_path(None)
 
     def draw_info_panel(self, fps):
         fps = f'FPS: {int(round(fps))}'